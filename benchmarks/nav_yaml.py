@@ -0,0 +1,70 @@
+"""
+Benchmark of the master mkdocs.yml load and dump, comparing the round-trip
+YAML path of mkdocs-merge with the fast nav path of mkdocsmerge.navyaml.
+
+Usage: python benchmarks/nav_yaml.py [NAV_ENTRIES ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from ruamel.yaml import YAML
+
+from mkdocsmerge import navyaml
+
+HEADER = """# Master site configuration
+site_name: Benchmark  # the name shown in the header
+theme:
+  name: material
+markdown_extensions:
+  - toc:
+      permalink: true
+"""
+
+
+def write_master(path, entries):
+    with open(path, "w") as master_file:
+        master_file.write(HEADER)
+        master_file.write("nav:\n")
+        for section in range((entries + 99) // 100):
+            master_file.write(f"  - Section {section}:\n")
+            for page in range(min(100, entries - section * 100)):
+                master_file.write(f"      - Page {page}: section_{section}/page_{page}.md\n")
+
+
+def round_trip(path):
+    yaml = YAML()
+    with open(path) as master_file:
+        data = yaml.load(master_file)
+    data["nav"].append({"New": "new.md"})
+    with open(path, "w") as master_file:
+        yaml.dump(data, master_file)
+
+
+def fast(path):
+    config = navyaml.MasterConfig(path)
+    config.data["nav"].append({"New": "new.md"})
+    config.save()
+
+
+def measure(function, path, entries):
+    write_master(path, entries)
+    started = time.perf_counter()
+    function(path)
+    return time.perf_counter() - started
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "mkdocs.yml")
+        print(f"{'nav entries':>12} {'round-trip (s)':>15} {'fast (s)':>10} {'speedup':>8}")
+        for entries in sizes:
+            slow_time = measure(round_trip, path, entries)
+            fast_time = measure(fast, path, entries)
+            print(f"{entries:>12} {slow_time:>15.3f} {fast_time:>10.3f} {slow_time / fast_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [1000, 10000, 50000])
@@ -1,8 +1,17 @@
 """MkDocs Merge module."""
 
+import functools
+import sys
+
 import click
 from mkdocsmerge import __version__
+from mkdocsmerge import events
+from mkdocsmerge import fanout as fanout_merge
+from mkdocsmerge import lock
 from mkdocsmerge import merge
+from mkdocsmerge import prebuilt as prebuilt_merge
+from mkdocsmerge import scheduler
+from mkdocsmerge import verify as nav_verify
 
 UNIFY_HELP = (
     'Unify sites with the same "site_name" into a single navigation '
@@ -12,6 +21,67 @@ UNIFY_HELP = (
     "from multiple sources."
 )
 
+PROGRESS_HELP = (
+    'How to report the merge progress: "bar" shows a live progress bar with '
+    'throughput and ETA, "json" writes one JSON event per line and "none" '
+    'only prints the status messages. Defaults to "auto", which uses "bar" '
+    'when the output is a terminal and "json" otherwise.'
+)
+
+TREE_INDEX_HELP = (
+    "Keep an index of the sites' source directories in the master site and "
+    "skip the directories that were not modified since the previous merge, "
+    "without listing them or checking their files. Files edited in place "
+    "(without being recreated) inside an unmodified directory are not detected."
+)
+
+MAX_FILES_HELP = "Copy up to this number of files concurrently, to speed up merges on network storage."
+
+MAX_BANDWIDTH_HELP = "Limit the speed of the file copies to this number of megabytes per second."
+
+RESUME_HELP = (
+    "Resume an interrupted merge of the same sites: the sites it completed are "
+    "not merged again and the master mkdocs.yml is written once all sites are merged."
+)
+
+MAX_DOWNLOADS_HELP = "Maximum number of site bundles downloaded concurrently."
+
+FAST_YAML_HELP = (
+    "Only parse and rewrite the nav of the master mkdocs.yml, keeping the rest "
+    "of the file as it is. Faster for master sites with very large navs."
+)
+
+DISCOVER_HELP = (
+    "Also merge every site found under this directory or glob pattern (any directory "
+    "with a mkdocs.yml), in path order. Can be given multiple times."
+)
+
+COALESCE_HELP = (
+    "Queue this merge in the master site while waiting for concurrent merges to finish, "
+    "so that all the merges queued meanwhile are done together in a single run."
+)
+
+LOCK_TIMEOUT_HELP = "Fail if concurrent merges hold the master site for longer than this number of seconds."
+
+MANIFEST_HELP = (
+    "Write to this JSON file the files added, modified and removed by the merge of each "
+    "site and the nav entries that changed, for incremental builds and cache purges."
+)
+
+OUTPUT_HELP = (
+    "Assemble the merged site in this directory instead of the master site, which is left "
+    "untouched: the master site files are linked into it and the merged sites are copied beside "
+    "them. Repeated merges into the same directory only update what changed."
+)
+
+LINK_HELP = "How the master site files are linked into the output directory."
+
+VERIFY_HELP = (
+    "After merging, check that every nav entry of the merged sites points to "
+    "a copied page, and report the copied pages that are not in the nav. "
+    "Exits with an error status when nav entries point to missing pages."
+)
+
 
 @click.group(context_settings={"help_option_names": ["-h", "--help"]})
 @click.version_option(__version__, "-V", "--version")
@@ -31,7 +101,8 @@ def cli():
 
     SITES: Paths to the sites to be merged. Each of this sites will be
     converted to a subpage of the master site. Their mkdocs.yml files
-    will be ignored except for the pages data.
+    will be ignored except for the pages data. Sites can also be given as
+    http(s):// URLs of tar bundles with the mkdocs.yml and docs folder.
     """
 
 
@@ -39,11 +110,169 @@ def cli():
 @click.argument("master-site", type=click.Path())
 @click.argument("sites", type=click.Path(), nargs=-1)
 @click.option("-u", "--unify-sites", is_flag=True, help=UNIFY_HELP)
-def run(master_site, sites, unify_sites):
+@click.option(
+    "--progress",
+    "progress_mode",
+    type=click.Choice(["auto", "bar", "json", "none"]),
+    default="auto",
+    show_default=True,
+    help=PROGRESS_HELP,
+)
+@click.option("--tree-index", is_flag=True, help=TREE_INDEX_HELP)
+@click.option("--verify", is_flag=True, help=VERIFY_HELP)
+@click.option("--max-files", type=click.IntRange(min=1), help=MAX_FILES_HELP)
+@click.option("--max-bandwidth", type=click.FloatRange(min=0, min_open=True), help=MAX_BANDWIDTH_HELP)
+@click.option("--resume", is_flag=True, help=RESUME_HELP)
+@click.option("--max-downloads", type=click.IntRange(min=1), default=4, show_default=True, help=MAX_DOWNLOADS_HELP)
+@click.option("--fast-yaml", is_flag=True, help=FAST_YAML_HELP)
+@click.option("--discover", "discover_roots", multiple=True, metavar="ROOT", help=DISCOVER_HELP)
+@click.option("--coalesce", is_flag=True, help=COALESCE_HELP)
+@click.option("--lock-timeout", type=click.FloatRange(min=0), metavar="SECONDS", help=LOCK_TIMEOUT_HELP)
+@click.option("--manifest", type=click.Path(dir_okay=False), help=MANIFEST_HELP)
+@click.option("--output", type=click.Path(file_okay=False), metavar="DIR", help=OUTPUT_HELP)
+@click.option(
+    "--link", type=click.Choice(["hardlink", "symlink"]), default="hardlink", show_default=True, help=LINK_HELP
+)
+def run(
+    master_site,
+    sites,
+    unify_sites,
+    progress_mode,
+    tree_index,
+    verify,
+    max_files,
+    max_bandwidth,
+    resume,
+    max_downloads,
+    fast_yaml,
+    discover_roots,
+    coalesce,
+    lock_timeout,
+    manifest,
+    output,
+    link,
+):
     """
     Executes the site merging.\n
     MASTER_SITE: base site of the merge.\n
     SITES: sites to merge into the base site.
     """
 
-    merge.run_merge(master_site, sites, unify_sites, print_func=click.echo)
+    print_func, progress = make_reporters(progress_mode)
+    io_scheduler = make_scheduler(max_files, max_bandwidth)
+    try:
+        merge.run_merge(
+            master_site,
+            sites,
+            unify_sites,
+            print_func=print_func,
+            progress=progress,
+            tree_index=tree_index,
+            verify=verify,
+            scheduler=io_scheduler,
+            resume=resume,
+            max_downloads=max_downloads,
+            fast_yaml=fast_yaml,
+            discover_roots=discover_roots,
+            coalesce=coalesce,
+            lock_timeout=lock_timeout,
+            manifest=manifest,
+            output=output,
+            link=link,
+        )
+    except (lock.LockTimeout, lock.MissingResult, nav_verify.VerificationFailed) as exc:
+        raise click.ClickException(str(exc))
+    finally:
+        if io_scheduler is not None:
+            io_scheduler.close()
+
+
+@cli.command()
+@click.argument("config", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--progress",
+    "progress_mode",
+    type=click.Choice(["auto", "bar", "json", "none"]),
+    default="auto",
+    show_default=True,
+    help=PROGRESS_HELP,
+)
+@click.option("--max-files", type=click.IntRange(min=1), help=MAX_FILES_HELP)
+@click.option("--max-bandwidth", type=click.FloatRange(min=0, min_open=True), help=MAX_BANDWIDTH_HELP)
+def fanout(config, progress_mode, max_files, max_bandwidth):
+    """
+    Merges sites into several master sites in a single pass.\n
+    CONFIG: YAML file with the "masters" list, each one with its
+    "master_site", "sites" and optional "unify_sites" and "dedup" settings.
+    """
+
+    try:
+        masters = fanout_merge.load_fanout_config(config)
+    except (ValueError, KeyError) as exc:
+        raise click.ClickException(str(exc))
+
+    print_func, progress = make_reporters(progress_mode)
+    io_scheduler = make_scheduler(max_files, max_bandwidth)
+    try:
+        fanout_merge.run_fanout_merge(masters, print_func=print_func, progress=progress, scheduler=io_scheduler)
+    finally:
+        if io_scheduler is not None:
+            io_scheduler.close()
+
+
+@cli.command()
+@click.argument("master-site", type=click.Path())
+@click.argument("sites", type=click.Path(), nargs=-1)
+@click.option("-u", "--unify-sites", is_flag=True, help=UNIFY_HELP)
+@click.option(
+    "--progress",
+    "progress_mode",
+    type=click.Choice(["auto", "bar", "json", "none"]),
+    default="auto",
+    show_default=True,
+    help=PROGRESS_HELP,
+)
+@click.option("--max-files", type=click.IntRange(min=1), help=MAX_FILES_HELP)
+@click.option("--max-bandwidth", type=click.FloatRange(min=0, min_open=True), help=MAX_BANDWIDTH_HELP)
+def prebuilt(master_site, sites, unify_sites, progress_mode, max_files, max_bandwidth):
+    """
+    Merges the built HTML of sites into the master site, which is built with
+    links to them.\n
+    MASTER_SITE: base site of the merge, its mkdocs.yml is not modified.\n
+    SITES: sites to merge, built with "mkdocs build".
+    """
+
+    print_func, progress = make_reporters(progress_mode)
+    io_scheduler = make_scheduler(max_files, max_bandwidth)
+    try:
+        prebuilt_merge.run_prebuilt_merge(
+            master_site, sites, unify_sites, print_func=print_func, progress=progress, scheduler=io_scheduler
+        )
+    finally:
+        if io_scheduler is not None:
+            io_scheduler.close()
+
+
+def make_reporters(progress_mode):
+    """
+    Returns the print_func and progress callback for the progress mode.
+    """
+    if progress_mode == "auto":
+        progress_mode = "bar" if sys.stdout.isatty() else "json"
+
+    if progress_mode == "bar":
+        progress = events.ProgressBar()
+        return progress.echo, progress
+    if progress_mode == "json":
+        # Keep stdout machine-readable, status messages go to stderr
+        return functools.partial(click.echo, err=True), events.JsonLinesReporter()
+    return click.echo, None
+
+
+def make_scheduler(max_files, max_bandwidth):
+    if not max_files and not max_bandwidth:
+        return None
+    return scheduler.IOScheduler(
+        max_files=max_files or 1,
+        bytes_per_second=max_bandwidth * 1e6 if max_bandwidth else None,
+    )
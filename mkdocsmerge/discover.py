@@ -0,0 +1,233 @@
+"""
+Discovery of the sites to merge: every directory with a mkdocs.yml under
+the given roots, scanned in parallel.
+"""
+
+import fnmatch
+import glob
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from mkdocsmerge import tree
+
+MKDOCS_YML = "mkdocs.yml"
+# Directories never containing sites, skipped with the hidden ones
+PRUNED_DIRS = {"node_modules", "__pycache__", "venv"}
+# Top-level docs_dir and site_dir settings, read without parsing the whole
+# mkdocs.yml of every discovered site
+SITE_DIR_SETTING = re.compile(r"""^(docs_dir|site_dir)\s*:\s*['"]?([^'"#\r\n]*?)['"]?\s*(#.*)?$""", re.MULTILINE)
+
+
+class DiscoveryCache:
+    """
+    Persisted result of the previous discovery: for every scanned directory,
+    its modification time, whether it is a site and its subdirectories to
+    scan. Directories not modified since are not listed again.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path=None):
+        self.path = path
+        self.dirs = {}
+        if path is None:
+            return
+        try:
+            with open(path) as cache_file:
+                data = json.load(cache_file)
+            if data.get("version") == self.VERSION:
+                self.dirs = data["dirs"]
+        except (OSError, ValueError, KeyError):
+            # A missing or corrupt cache only means a full scan
+            self.dirs = {}
+
+    def save(self, dirs):
+        """
+        Replaces the cache with the directories of the last discovery.
+        """
+        self.dirs = dirs
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as cache_file:
+            json.dump({"version": self.VERSION, "dirs": self.dirs}, cache_file)
+        os.replace(tmp_path, self.path)
+
+
+def is_pattern(root):
+    return glob.has_magic(root)
+
+
+def discover_sites(roots, cache=None, max_workers=8, exclude=()):
+    """
+    Finds the sites under the discovery roots, directories or glob patterns
+    matching directories.
+
+    Hidden directories, the PRUNED_DIRS and the docs_dir and site_dir of
+    every site are not scanned, nor are symbolic links to directories. The
+    same rules apply to the directories matched by glob patterns. Only the
+    part of a pattern before its first "**" is expanded with glob, the
+    directories below are found by the parallel scan.
+
+    Args:
+        roots: Discovery roots, directories or glob patterns
+        cache: Optional DiscoveryCache, updated with the scanned directories
+        max_workers: Number of directories scanned concurrently
+        exclude: Paths of sites left out of the result (e.g. the master site)
+
+    Returns:
+        Sorted list of site paths, relative to the current directory when the
+        roots are
+    """
+    cache = cache if cache is not None else DiscoveryCache()
+    # Directories to scan, with the rest of their pattern their subdirectories
+    # must match for their sites to be discovered (None when any does)
+    base_dirs = {}
+    for root in roots:
+        for base_dir, rest in _expand_root(root):
+            base_dirs.setdefault(base_dir, rest)
+
+    racy_limit = time.time_ns() - tree.RACY_NS
+    scanned = {}
+    visited = set()
+    sites = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+
+        def submit(directory, abs_dir, parts, rest):
+            # Directories below a match are all in, whatever their pattern
+            if rest is not None and _match_parts(parts, rest):
+                rest = None
+            key = (abs_dir,) if rest is None else (abs_dir, parts, rest)
+            if (abs_dir,) in visited or key in visited:
+                return
+            visited.add(key)
+            future = executor.submit(_scan_dir, directory, abs_dir, cache.dirs.get(abs_dir), racy_limit)
+            pending[future] = (parts, rest)
+
+        for base_dir, rest in base_dirs.items():
+            submit(base_dir, os.path.abspath(base_dir), (), rest)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                parts, rest = pending.pop(future)
+                directory, abs_dir, entry = future.result()
+                if entry is None:
+                    continue
+                scanned[abs_dir] = entry
+                if entry["site"] and rest is None:
+                    sites.add(directory)
+                for name in entry["dirs"]:
+                    submit(os.path.join(directory, name), os.path.join(abs_dir, name), parts + (name,), rest)
+
+    cache.save(scanned)
+    excluded = {os.path.abspath(path) for path in exclude}
+    return sorted(site for site in sites if os.path.abspath(site) not in excluded)
+
+
+def _expand_root(root):
+    """
+    Returns the (directory, rest) scan roots of a discovery root, rest being
+    the components of the pattern after its first "**", or None.
+    """
+    if not is_pattern(root):
+        return [(os.path.normpath(root), None)] if os.path.isdir(root) else []
+
+    parts = os.path.normpath(root).split(os.sep)
+    fixed = next(number for number, part in enumerate(parts) if glob.has_magic(part))
+    recursive = parts.index("**") if "**" in parts else len(parts)
+    base_dir = os.sep.join(parts[:fixed]) or (os.sep if fixed else os.curdir)
+    rest = tuple(parts[recursive:]) or None
+    if rest == ("**",):
+        rest = None
+
+    if recursive == fixed:
+        matches = [base_dir]
+    else:
+        matches = sorted(glob.glob(os.sep.join(parts[:recursive])))
+    return [
+        (os.path.normpath(match), rest)
+        for match in matches
+        if os.path.isdir(match) and not _is_pruned(base_dir, os.path.normpath(match))
+    ]
+
+
+def _is_pruned(base_dir, directory):
+    """
+    Whether the scan of base_dir would skip directory, found under it.
+    """
+    current = base_dir
+    for name in os.path.relpath(directory, base_dir).split(os.sep):
+        if name == os.curdir:
+            continue
+        path = os.path.join(current, name)
+        if name.startswith(".") or name in PRUNED_DIRS or os.path.islink(path):
+            return True
+        yml_path = os.path.join(current, MKDOCS_YML)
+        if os.path.isfile(yml_path) and name in _site_dirs(yml_path):
+            return True
+        current = path
+    return False
+
+
+def _match_parts(parts, pattern):
+    """
+    Whether the path components match the pattern components, "**" matching
+    any number of them.
+    """
+    if not pattern:
+        return not parts
+    if pattern[0] == "**":
+        return any(_match_parts(parts[number:], pattern[1:]) for number in range(len(parts) + 1))
+    return bool(parts) and fnmatch.fnmatchcase(parts[0], pattern[0]) and _match_parts(parts[1:], pattern[1:])
+
+
+def _scan_dir(directory, abs_dir, cached, racy_limit):
+    """
+    Returns the directory, its absolute path and its cache entry, None if
+    it could not be read.
+    """
+    try:
+        mtime_ns = os.stat(abs_dir).st_mtime_ns
+        if cached is not None and cached["mtime_ns"] == mtime_ns and mtime_ns < racy_limit:
+            # Editing the mkdocs.yml of a site does not modify its directory
+            if not cached["site"] or cached["yml_mtime_ns"] == os.stat(os.path.join(abs_dir, MKDOCS_YML)).st_mtime_ns:
+                return directory, abs_dir, cached
+
+        dirs = []
+        yml_mtime_ns = None
+        with os.scandir(abs_dir) as entries:
+            for entry in entries:
+                if entry.name == MKDOCS_YML and entry.is_file():
+                    yml_mtime_ns = entry.stat().st_mtime_ns
+                elif entry.is_dir(follow_symlinks=False) and not entry.name.startswith("."):
+                    if entry.name not in PRUNED_DIRS:
+                        dirs.append(entry.name)
+        if yml_mtime_ns is not None:
+            pruned = _site_dirs(os.path.join(abs_dir, MKDOCS_YML))
+            dirs = [name for name in dirs if name not in pruned]
+    except OSError:
+        return directory, abs_dir, None
+
+    entry = {
+        "mtime_ns": mtime_ns,
+        "site": yml_mtime_ns is not None,
+        "yml_mtime_ns": yml_mtime_ns,
+        "dirs": sorted(dirs),
+    }
+    return directory, abs_dir, entry
+
+
+def _site_dirs(yml_path):
+    """
+    Names of the docs_dir and site_dir of a site, which are not scanned.
+    """
+    settings = {"docs_dir": "docs", "site_dir": "site"}
+    with open(yml_path, errors="replace") as yml_file:
+        for match in SITE_DIR_SETTING.finditer(yml_file.read()):
+            settings[match.group(1)] = match.group(2)
+    return {os.path.normpath(value).split(os.sep)[0] for value in settings.values() if value}
@@ -0,0 +1,129 @@
+"""
+Structured progress events emitted while merging sites.
+
+A progress callback receives the event name and a dictionary payload made of
+JSON serializable values, e.g. ``progress("file_copied", {"site": ..., "bytes": 12})``.
+"""
+
+import json
+import sys
+import time
+
+
+MERGE_STARTED = "merge_started"
+MERGE_FINISHED = "merge_finished"
+SITE_STARTED = "site_started"
+SITE_FINISHED = "site_finished"
+SITE_SKIPPED = "site_skipped"
+FILE_COPIED = "file_copied"
+ERROR = "error"
+
+
+def emit(progress, event, **payload):
+    """
+    Sends an event to the progress callback, if one was given.
+    """
+    if progress is not None:
+        progress(event, payload)
+
+
+class JsonLinesReporter:
+    """
+    Writes every event as a single JSON object per line, for consumption by
+    other tools when the output is not a terminal.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def __call__(self, event, payload):
+        record = {"event": event, "time": round(time.time(), 3)}
+        record.update(payload)
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+
+class ProgressBar:
+    """
+    Renders the events as a live status line with throughput and ETA. The ETA
+    is estimated from the average time taken by the sites already processed.
+    """
+
+    WIDTH = 20
+    REFRESH_SECONDS = 0.1
+
+    def __init__(self, stream=None, clock=time.monotonic):
+        self.stream = stream or sys.stdout
+        self.clock = clock
+        self.started = clock()
+        self.last_render = None
+        self.total_sites = 0
+        self.done_sites = 0
+        self.files = 0
+        self.bytes = 0
+        self.current_site = ""
+
+    def __call__(self, event, payload):
+        if event == MERGE_STARTED:
+            self.started = self.clock()
+            self.total_sites = payload["total_sites"]
+        elif event == SITE_STARTED:
+            self.current_site = payload["site"]
+        elif event in (SITE_FINISHED, SITE_SKIPPED):
+            self.done_sites += 1
+        elif event == FILE_COPIED:
+            self.files += 1
+            self.bytes += payload["bytes"]
+            # Avoid flooding the terminal when copying lots of small files
+            now = self.clock()
+            if self.last_render is not None and now - self.last_render < self.REFRESH_SECONDS:
+                return
+        elif event == MERGE_FINISHED:
+            self.current_site = ""
+            self.render()
+            self.stream.write("\n")
+            self.stream.flush()
+            return
+        self.render()
+
+    def echo(self, message):
+        """
+        Prints a message above the status line, to be used as ``print_func``.
+        """
+        self.stream.write("\r\033[K" + str(message) + "\n")
+        self.render()
+
+    def render(self):
+        self.last_render = self.clock()
+        self.stream.write("\r\033[K" + self.status_line())
+        self.stream.flush()
+
+    def status_line(self):
+        elapsed = max(self.clock() - self.started, 1e-6)
+        total = max(self.total_sites, 1)
+        filled = int(self.WIDTH * self.done_sites / total)
+        bar = "#" * filled + "-" * (self.WIDTH - filled)
+
+        if self.done_sites and self.total_sites:
+            remaining = elapsed / self.done_sites * (self.total_sites - self.done_sites)
+            eta = format_seconds(remaining)
+        else:
+            eta = "--:--"
+
+        return (
+            f"[{bar}] {self.done_sites}/{self.total_sites} sites "
+            f"{self.files} files {self.bytes / 1e6:.1f} MB "
+            f"{self.files / elapsed:.1f} files/s {self.bytes / 1e6 / elapsed:.1f} MB/s "
+            f"ETA {eta} {self.current_site}"
+        ).rstrip()
+
+
+def format_seconds(seconds):
+    """
+    Formats a duration as H:MM:SS, or MM:SS when it is shorter than an hour.
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
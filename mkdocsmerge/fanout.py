@@ -0,0 +1,167 @@
+"""
+Fan-out merge of the same sites into several master sites in a single pass:
+each site is loaded once and its docs_dir is walked once, copying its files
+into every master site that includes it.
+"""
+
+import contextlib
+import copy
+import os
+import time
+
+from ruamel.yaml import YAML
+
+from mkdocsmerge import events
+from mkdocsmerge import lock
+from mkdocsmerge import merge
+from mkdocsmerge import tree
+
+
+def load_fanout_config(path):
+    """
+    Loads a fan-out configuration file, a YAML file with a "masters" list:
+
+        masters:
+          - master_site: portals/public
+            sites: [sites/project_a, sites/project_b]
+            unify_sites: true
+            dedup: true
+
+    Paths are relative to the configuration file.
+
+    Returns:
+        List of master site dictionaries for run_fanout_merge
+    """
+    with open(path) as config_file:
+        config = YAML(typ="safe").load(config_file)
+    if not isinstance(config, dict) or not isinstance(config.get("masters"), list):
+        raise ValueError('The fan-out configuration file "' + path + '" must have a "masters" list')
+
+    base_dir = os.path.dirname(path)
+    masters = []
+    for master in config["masters"]:
+        masters.append(
+            {
+                "master_site": os.path.join(base_dir, master["master_site"]),
+                "sites": [os.path.join(base_dir, site) for site in master.get("sites", [])],
+                "unify_sites": bool(master.get("unify_sites", False)),
+                "dedup": bool(master.get("dedup", True)),
+            }
+        )
+    return masters
+
+
+def run_fanout_merge(masters, print_func, progress=None, scheduler=None):
+    """
+    Merges sites into several master sites, reading and copying every site
+    only once.
+
+    Args:
+        masters: List of dictionaries with the "master_site" path, the list of
+                 "sites" to merge into it and optionally "unify_sites" (default
+                 False) and "dedup" (default True, replaces the existing
+                 entries of the merged sites in the master nav)
+        print_func: Function to use for printing status messages
+        progress: Optional callback receiving structured progress events
+        scheduler: Optional scheduler.IOScheduler used to copy the files
+
+    Returns:
+        Dictionary with the updated data of each master site, by path
+    """
+    targets = []
+    for master in masters:
+        master_yaml = os.path.join(master["master_site"], merge.MKDOCS_YML)
+        if not os.path.isfile(master_yaml):
+            print_func("Could not find the master site yml file, " "make sure it exists: " + master_yaml)
+            events.emit(progress, events.ERROR, site=master["master_site"], message="Master site yml file not found")
+            continue
+        targets.append({"master": master, "yaml": master_yaml, "navs": {}})
+
+    # Merges into the same master sites wait for each other. The locks of all
+    # the master sites are held during the whole merge, and are taken in the
+    # same order by every invocation
+    with contextlib.ExitStack() as locks:
+        for master_site in sorted({os.path.realpath(target["master"]["master_site"]) for target in targets}):
+            locks.enter_context(lock.MasterLock(os.path.join(master_site, merge.STATE_DIR, merge.LOCK_FILE)))
+        return _merge_targets(targets, print_func, progress, scheduler)
+
+
+def _merge_targets(targets, print_func, progress, scheduler):
+    yaml = YAML()
+    for target in targets:
+        with open(target["yaml"]) as master_file:
+            target["data"] = yaml.load(master_file)
+        target["docs_root"] = os.path.join(target["master"]["master_site"], target["data"].get("docs_dir", "docs"))
+
+    # Every site is processed once, in the order they first appear
+    sites = list(dict.fromkeys(site for target in targets for site in target["master"]["sites"]))
+
+    events.emit(progress, events.MERGE_STARTED, total_sites=len(sites))
+    for index, site in enumerate(sites):
+        print_func("\nAttempting to merge site: " + site)
+        events.emit(progress, events.SITE_STARTED, site=site, index=index, total_sites=len(sites))
+        started = time.monotonic()
+
+        loaded = merge.load_site(site, print_func, progress)
+        if loaded is None:
+            continue
+        site_data, site_name, site_root, site_docs = loaded
+
+        site_targets = [target for target in targets if site in target["master"]["sites"]]
+        destinations = [os.path.join(target["docs_root"], site_root) for target in site_targets]
+        copy_file = merge.make_copy_function(site, site_docs, progress, scheduler)
+        try:
+            results = tree.copy_tree_multi(site_docs, destinations, copy_function=copy_file)
+            if scheduler is not None:
+                scheduler.wait()
+        except OSError as exc:
+            print_func('Error copying files of site "' + site_name + '". This site will be skipped.')
+            print_func(exc.strerror)
+            events.emit(progress, events.ERROR, site=site, message=str(exc))
+            events.emit(progress, events.SITE_SKIPPED, site=site, reason="Error copying files")
+            continue
+
+        merge.update_navs(site_data[merge.CONFIG_NAVIGATION], site_root, print_func=print_func)
+        for target in site_targets:
+            target["navs"][site] = (site_name, site_data[merge.CONFIG_NAVIGATION])
+
+        print_func(
+            'Successfully merged site located in "' + site + '" as sub-site "' + site_name + '" '
+            "into " + str(len(site_targets)) + " master sites\n"
+        )
+        events.emit(
+            progress,
+            events.SITE_FINISHED,
+            site=site,
+            site_name=site_name,
+            files=sum(len(result.copied) for result in results),
+            unchanged=sum(len(result.unchanged) for result in results),
+            bytes=sum(result.bytes for result in results),
+            seconds=round(time.monotonic() - started, 3),
+        )
+    events.emit(progress, events.MERGE_FINISHED, total_sites=len(sites))
+
+    merged_data = {}
+    for target in targets:
+        master = target["master"]
+        master_data = target["data"]
+        site_navs = [target["navs"][site] for site in master["sites"] if site in target["navs"]]
+
+        if master["dedup"]:
+            site_names = {site_name for site_name, _ in site_navs}
+            master_data[merge.CONFIG_NAVIGATION] = merge.remove_existing_sites_from_nav(
+                master_data[merge.CONFIG_NAVIGATION], site_names
+            )
+
+        # Each master site gets its own copy of the nav, as unification
+        # modifies it
+        new_navs = []
+        for site_name, site_nav in site_navs:
+            merge.merge_single_site(new_navs, site_name, copy.deepcopy(site_nav), master["unify_sites"])
+        master_data[merge.CONFIG_NAVIGATION] += new_navs
+
+        with open(target["yaml"], "w") as master_file:
+            yaml.dump(master_data, master_file)
+        merged_data[master["master_site"]] = master_data
+
+    return merged_data
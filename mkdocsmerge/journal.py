@@ -0,0 +1,82 @@
+"""
+Checkpoint journal of a merge in progress, used to resume interrupted merges.
+
+The journal is a JSON lines file: a header with the merge arguments followed by
+one line per completed site with its rewritten nav and the files it copied. Every line is flushed to
+disk when written, so only the site being merged is lost if the process dies.
+"""
+
+import json
+import os
+
+
+class Journal:
+    """
+    Journal of the sites completed by a merge with the given arguments.
+    """
+
+    def __init__(self, path, sites, unify_sites):
+        self.path = path
+        self.header = {"sites": list(sites), "unify_sites": bool(unify_sites)}
+        self.completed = {}
+
+    def resume(self):
+        """
+        Loads the sites completed by a previous merge with the same arguments.
+        Returns False if there is no such journal.
+        """
+        try:
+            with open(self.path) as journal_file:
+                lines = journal_file.read().splitlines()
+        except OSError:
+            return False
+
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # The last line may be truncated if the process died writing it
+                break
+        if not records or records[0] != self.header:
+            return False
+
+        self.completed = {record["site"]: record for record in records[1:]}
+        return True
+
+    def start(self):
+        """
+        Starts a new journal, keeping the sites loaded by resume().
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as journal_file:
+            for record in [self.header] + list(self.completed.values()):
+                journal_file.write(json.dumps(record) + "\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+    def record(self, site, site_name, site_root, nav, copied=None):
+        """
+        Records a completed site, its rewritten nav and optionally the result
+        of copying its files (see tree.CopyResult.to_dict).
+        """
+        record = {"site": site, "site_name": site_name, "site_root": site_root, "nav": nav}
+        if copied is not None:
+            record["copied"] = copied
+        self.completed[site] = record
+        with open(self.path, "a") as journal_file:
+            journal_file.write(json.dumps(record) + "\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+    def get(self, site):
+        return self.completed.get(site)
+
+    def clear(self):
+        """
+        Removes the journal once the merge has been completely written.
+        """
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,191 @@
+"""
+Serialization of concurrent merges into the same master site.
+
+Every merge holds an advisory lock on a file of the master site while it
+updates it. With coalescing, each invocation also queues its request in the
+master site before waiting for the lock, and the invocation getting the
+lock merges all the queued requests at once: the others find their request
+already merged when they get the lock in turn, along with the result the
+merging invocation left for them (e.g. their manifest).
+"""
+
+import contextlib
+import json
+import os
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class LockTimeout(Exception):
+    """
+    The lock of the master site could not be acquired in time.
+    """
+
+
+class MissingResult(Exception):
+    """
+    A request merged by a concurrent invocation has no result.
+    """
+
+
+class MasterLock:
+    """
+    Advisory lock on a file, held by one process at a time. Only other
+    MasterLock users are blocked.
+    """
+
+    def __init__(self, path, timeout=None, poll_interval=0.1):
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.lock_file = None
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        lock_file = open(self.path, "a+")
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not _try_lock(lock_file):
+            if deadline is not None and time.monotonic() >= deadline:
+                lock_file.close()
+                raise LockTimeout('Timed out waiting for the lock "' + self.path + '"')
+            time.sleep(self.poll_interval)
+        self.lock_file = lock_file
+
+    def release(self):
+        if self.lock_file is not None:
+            _unlock(self.lock_file)
+            self.lock_file.close()
+            self.lock_file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class RequestQueue:
+    """
+    Merge requests waiting for the lock of the master site, one JSON file per
+    request, named so they sort in submission order.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def submit(self, sites, unify_sites, manifest=False, verify=False):
+        """
+        Queues a request and returns its id. With manifest or verify, the
+        invocation merging the request saves the manifest of its sites or the
+        outcome of their verification as its result.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        request_id = f"{time.time_ns():020d}-{uuid.uuid4().hex}"
+        request = {"sites": list(sites), "unify_sites": unify_sites}
+        if manifest:
+            request["manifest"] = True
+        if verify:
+            request["verify"] = True
+        self._write(request_id + ".tmp", request, self._path(request_id))
+        return request_id
+
+    def is_pending(self, request_id):
+        return os.path.isfile(self._path(request_id))
+
+    def pending(self):
+        """
+        Returns the queued requests as (request_id, request) tuples, in
+        submission order.
+        """
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return []
+        requests = []
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as request_file:
+                    requests.append((os.path.splitext(name)[0], json.load(request_file)))
+            except (OSError, ValueError):
+                continue
+        return requests
+
+    def complete(self, request_ids):
+        for request_id in request_ids:
+            try:
+                os.remove(self._path(request_id))
+            except FileNotFoundError:
+                pass
+
+    @contextlib.contextmanager
+    def withdraw_on_error(self, request_id):
+        """
+        Removes the request when the block raises, e.g. when the lock is not
+        acquired in time, so that no later merge picks up the sites of a
+        failed invocation.
+        """
+        try:
+            yield
+        except BaseException:
+            self.complete([request_id])
+            raise
+
+    def save_result(self, request_id, result):
+        """
+        Saves the result of a request merged for another invocation, before
+        completing it.
+        """
+        self._write(request_id + ".tmp", result, self._result_path(request_id))
+
+    def pop_result(self, request_id):
+        """
+        Returns and removes the result of a request, None if there is none.
+        """
+        path = self._result_path(request_id)
+        try:
+            with open(path) as result_file:
+                result = json.load(result_file)
+        except (OSError, ValueError):
+            return None
+        os.remove(path)
+        return result
+
+    def _write(self, tmp_name, data, path):
+        tmp_path = os.path.join(self.directory, tmp_name)
+        with open(tmp_path, "w") as data_file:
+            json.dump(data, data_file)
+        os.replace(tmp_path, path)
+
+    def _path(self, request_id):
+        return os.path.join(self.directory, request_id + ".json")
+
+    def _result_path(self, request_id):
+        return os.path.join(self.directory, request_id + ".result")
+
+
+def _try_lock(lock_file):
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    else:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,171 @@
+"""
+Manifest of the pages changed by a merge, for incremental downstream builds
+and cache purges.
+
+The added and modified files come from the comparisons of the copy step. The
+removed files are the ones copied by the previous merge of the same site that
+the site does not have anymore, which requires the list of files of every
+merged site to be kept in the master site between merges (see FileList).
+They are deleted from the master docs_dir (see remove_files), so the
+manifest matches the merged tree.
+"""
+
+import json
+import os
+
+VERSION = 1
+
+
+class FileList:
+    """
+    Persisted list of the files of every merged site, by site.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sites = {}
+        try:
+            with open(path) as list_file:
+                data = json.load(list_file)
+            if data.get("version") == VERSION:
+                self.sites = data["sites"]
+        except (OSError, ValueError, KeyError):
+            # Without the previous list, no file is reported as removed
+            self.sites = {}
+
+    def get(self, site):
+        return self.sites.get(_site_key(site))
+
+    def record(self, site, site_root, files):
+        self.sites[_site_key(site)] = {"site_root": site_root, "files": sorted(files)}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as list_file:
+            json.dump({"version": VERSION, "sites": self.sites}, list_file)
+        os.replace(tmp_path, self.path)
+
+
+def build_manifest(merged_sites, file_list, old_nav, new_nav):
+    """
+    Builds the manifest of a merge and records the files of the merged sites
+    in the file list.
+
+    Args:
+        merged_sites: List of merge.MergedSite records
+        file_list: FileList with the files of the previous merges
+        old_nav: Master nav before the merge
+        new_nav: Master nav after the merge
+
+    Returns:
+        Dictionary with the added, modified and removed files of each site,
+        relative to the master docs_dir, and the added and removed nav entries
+    """
+    # Files of sites unified under the same root are not removed while
+    # another site still has them
+    current = {}
+    for merged in merged_sites:
+        current.setdefault(merged.site_root, set()).update(merged.copied.files)
+
+    sites = []
+    for merged in merged_sites:
+        previous = file_list.get(merged.site) or {"site_root": merged.site_root, "files": []}
+        removed = set(previous["files"]) - current.get(previous["site_root"], set())
+        sites.append(
+            {
+                "site": merged.site,
+                "site_name": merged.site_name,
+                "site_root": merged.site_root,
+                "added": _paths(merged.site_root, merged.copied.added),
+                "modified": _paths(merged.site_root, merged.copied.modified),
+                "removed": _paths(previous["site_root"], removed),
+            }
+        )
+        file_list.record(merged.site, merged.site_root, merged.copied.files)
+
+    old_entries = set(nav_entries(old_nav))
+    new_entries = set(nav_entries(new_nav))
+    return {
+        "version": VERSION,
+        "sites": sites,
+        "nav": {
+            "added": [_nav_entry(entry) for entry in sorted(new_entries - old_entries)],
+            "removed": [_nav_entry(entry) for entry in sorted(old_entries - new_entries)],
+        },
+    }
+
+
+def remove_files(docs_root, manifest):
+    """
+    Deletes the files reported as removed by a manifest from the master
+    docs_dir, and the folders left empty.
+    """
+    for entry in manifest["sites"]:
+        for path in entry["removed"]:
+            file_path = os.path.join(docs_root, *path.split("/"))
+            try:
+                os.unlink(file_path)
+            except FileNotFoundError:
+                continue
+            directory = os.path.dirname(file_path)
+            while os.path.abspath(directory) != os.path.abspath(docs_root):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    # Not empty
+                    break
+                directory = os.path.dirname(directory)
+
+
+def select_sites(manifest, sites):
+    """
+    Returns the part of a manifest about the given sites: their entries and
+    the nav entries of their sections.
+    """
+    keys = {_site_key(site) for site in sites}
+    entries = [entry for entry in manifest["sites"] if _site_key(entry["site"]) in keys]
+    site_names = {entry["site_name"] for entry in entries}
+    return {
+        "version": manifest["version"],
+        "sites": entries,
+        "nav": {
+            change: [entry for entry in changed if entry["titles"][:1] and entry["titles"][0] in site_names]
+            for change, changed in manifest["nav"].items()
+        },
+    }
+
+
+def write_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+        manifest_file.write("\n")
+
+
+def nav_entries(nav, titles=()):
+    """
+    Yields a (titles, path) tuple for every page and link of a nav, titles
+    being the section titles down to the entry.
+    """
+    if isinstance(nav, list):
+        for item in nav:
+            yield from nav_entries(item, titles)
+    elif isinstance(nav, dict):
+        for title, value in nav.items():
+            yield from nav_entries(value, titles + (str(title),))
+    elif nav is not None:
+        yield titles, str(nav)
+
+
+def _nav_entry(entry):
+    titles, path = entry
+    return {"titles": list(titles), "path": path}
+
+
+def _paths(site_root, files):
+    return sorted(site_root + "/" + path for path in files)
+
+
+def _site_key(site):
+    return site if "://" in site else os.path.abspath(site)
@@ -1,13 +1,61 @@
+import contextlib
+import io
+import json
 import os.path
-import shutil
+import time
+from collections import namedtuple
 from ruamel.yaml import YAML
 
+from mkdocsmerge import discover
+from mkdocsmerge import events
+from mkdocsmerge import lock
+from mkdocsmerge import mirror
+from mkdocsmerge import manifest as pages_manifest
+from mkdocsmerge import navyaml
+from mkdocsmerge import remote
+from mkdocsmerge import tree
+from mkdocsmerge import verify as nav_verify
+from mkdocsmerge.journal import Journal
+
 
 MKDOCS_YML = "mkdocs.yml"
 CONFIG_NAVIGATION = "nav"
-
-
-def run_merge(master_site, sites, unify_sites, print_func):
+# Directory of the master site where MkDocs Merge keeps its own state
+STATE_DIR = ".mkdocs-merge"
+TREE_INDEX_FILE = "tree-index.json"
+JOURNAL_FILE = "journal.jsonl"
+REMOTE_CACHE_FILE = "remote-cache.json"
+DISCOVERY_CACHE_FILE = "discovery-cache.json"
+LOCK_FILE = "lock"
+QUEUE_DIR = "queue"
+FILE_LIST_FILE = "files.json"
+MIRROR_FILE = "mirror.json"
+OUTPUT_SITES_FILE = "output-sites.json"
+
+# Record of a successfully merged site: its rewritten nav and the result of
+# copying its docs_dir (a tree.CopyResult)
+MergedSite = namedtuple("MergedSite", ["site", "site_name", "site_root", "nav", "copied"])
+
+
+def run_merge(
+    master_site,
+    sites,
+    unify_sites,
+    print_func,
+    progress=None,
+    tree_index=False,
+    verify=False,
+    scheduler=None,
+    resume=False,
+    max_downloads=4,
+    fast_yaml=False,
+    discover_roots=None,
+    coalesce=False,
+    lock_timeout=None,
+    manifest=None,
+    output=None,
+    link="hardlink",
+):
     """
     Merges multiple MkDocs sites into a master site.
 
@@ -20,17 +68,60 @@ def run_merge(master_site, sites, unify_sites, print_func):
 
     Args:
         master_site: Path to the master site directory
-        sites: List of site directory paths to merge
+        sites: List of site directory paths to merge, or URLs of site bundles
+               (see mkdocsmerge.remote)
         unify_sites: If True, sites with the same name within a single merge
                     operation will be unified
         print_func: Function to use for printing status messages
+        progress: Optional callback receiving structured progress events, see
+                  the mkdocsmerge.events module
+        tree_index: If True, a directory index persisted in the master site is
+                    used to skip the source directories not modified since the
+                    previous merge (see mkdocsmerge.tree.TreeIndex)
+        verify: If True, checks that every nav entry of the merged sites
+                points to a copied page and reports the pages not in the nav.
+                The merge is still written, then verify.VerificationFailed is
+                raised if nav entries point to missing pages. With coalesce,
+                the request merged by a concurrent merge gets the
+                verification of the request's sites
+        scheduler: Optional scheduler.IOScheduler used to copy the files with
+                   concurrency and bandwidth limits
+        resume: If True, the sites completed by a previous interrupted merge
+                with the same arguments are not merged again, their nav is
+                taken from the checkpoint journal of the master site
+        max_downloads: Maximum number of site bundles downloaded concurrently
+        fast_yaml: If True, only the nav of the master mkdocs.yml is parsed and
+                   rewritten, the rest of the file is kept as it is (see
+                   mkdocsmerge.navyaml)
+        discover_roots: Optional directories or glob patterns scanned for
+                        more sites to merge, any directory with a mkdocs.yml
+                        (see mkdocsmerge.discover)
+        coalesce: If True, the merge requests queued by concurrent invocations
+                  while waiting for the master site lock are merged together
+                  in a single run (see mkdocsmerge.lock)
+        lock_timeout: Maximum number of seconds to wait for the master site
+                      lock, raises lock.LockTimeout when exceeded. Waits
+                      indefinitely by default
+        manifest: Optional path of a JSON file where the files added,
+                  modified and removed by the merge of each site and the
+                  changed nav entries are written (see mkdocsmerge.manifest).
+                  The files removed from the sites since the previous merge
+                  with a manifest are deleted from the master docs_dir.
+                  With coalesce, the request merged by a concurrent merge
+                  gets the part of its manifest about the request's sites
+        output: Optional directory where the merged site is assembled instead
+                of the master site, which is then only read: the master site
+                files are linked into it (see mkdocsmerge.mirror) and the
+                merge state is kept in it
+        link: How the master site files are linked into the output directory,
+              "hardlink" (falling back to symbolic links) or "symlink"
 
     Returns:
         Dictionary containing the updated master site data
     """
 
     # Custom argument validation instead of an ugly generic error
-    if not sites:
+    if not sites and not discover_roots:
         print_func(
             "Please specify one or more sites to merge to the master "
             'site.\nUse "mkdocs-merge run -h" for more information.'
@@ -41,113 +132,460 @@ def run_merge(master_site, sites, unify_sites, print_func):
     master_yaml = os.path.join(master_site, MKDOCS_YML)
     if not os.path.isfile(master_yaml):
         print_func("Could not find the master site yml file, " "make sure it exists: " + master_yaml)
+        events.emit(progress, events.ERROR, site=master_site, message="Master site yml file not found")
         return None
 
-    # Round-trip yaml loader to preserve formatting and comments
-    yaml = YAML()
-    with open(master_yaml) as master_file:
-        master_data = yaml.load(master_file)
-
-    master_docs_dir = master_data.get("docs_dir", "docs")
-    master_docs_root = os.path.join(master_site, master_docs_dir)
-
-    # Get site names that will be merged for deduplication
-    site_names_to_merge = get_site_names_from_sites(sites, print_func)
-
-    # Remove existing entries for sites that are being re-merged to prevent
-    # duplication
-    if site_names_to_merge:
-        original_nav_count = len(master_data[CONFIG_NAVIGATION])
-        master_data[CONFIG_NAVIGATION] = remove_existing_sites_from_nav(
-            master_data[CONFIG_NAVIGATION], site_names_to_merge
+    # In output mode the merge is done in the output directory, the master
+    # site is only read
+    target_site = master_site if output is None else output
+    state_dir = os.path.join(target_site, STATE_DIR)
+
+    # Sites found under the discovery roots are merged after the given ones,
+    # in a stable order
+    if discover_roots:
+        cache = discover.DiscoveryCache(os.path.join(state_dir, DISCOVERY_CACHE_FILE))
+        excluded = [master_site, target_site] + [site for site in sites if not remote.is_remote(site)]
+        discovered = discover.discover_sites(discover_roots, cache, exclude=excluded)
+        print_func(f"Discovered {len(discovered)} sites to merge")
+        sites = list(sites) + discovered
+        if not sites:
+            return None
+
+    # Merges into the same master site are serialized, and with coalescing
+    # the requests queued meanwhile are merged together. A request is
+    # withdrawn when its invocation fails, e.g. on a lock timeout
+    request_guard = contextlib.nullcontext()
+    if coalesce:
+        queue = lock.RequestQueue(os.path.join(state_dir, QUEUE_DIR))
+        request_id = queue.submit(
+            [site if remote.is_remote(site) else os.path.abspath(site) for site in sites],
+            unify_sites,
+            manifest=manifest is not None,
+            verify=verify,
         )
-        removed_count = original_nav_count - len(master_data[CONFIG_NAVIGATION])
-        if removed_count > 0:
-            print_func(f"Removed {removed_count} existing site entries to prevent duplication")
-
-    # Get all site's navigation pages and copy their files
-    new_navs = merge_sites(sites, master_docs_root, unify_sites, print_func)
-
-    # then add them to the master nav section
-    master_data[CONFIG_NAVIGATION] += new_navs
-
-    # Rewrite the master's mkdocs.yml
-    with open(master_yaml, "w") as master_file:
-        yaml.dump(master_data, master_file)
-
-    return master_data
-
+        request_guard = queue.withdraw_on_error(request_id)
+    with request_guard, lock.MasterLock(os.path.join(state_dir, LOCK_FILE), timeout=lock_timeout):
+        # The other coalesced requests get the results they asked for about
+        # their sites
+        result_requests = []
+        results = {}
+        if coalesce:
+            if not queue.is_pending(request_id):
+                print_func("The sites were merged together with the request of a concurrent merge")
+                # That merge saved the manifest and the verification of these sites
+                if manifest is None and not verify:
+                    return None
+                result = queue.pop_result(request_id)
+                if result is None:
+                    raise lock.MissingResult("The concurrent merge did not save the result of the request")
+                if manifest is not None:
+                    pages_manifest.write_manifest(manifest, result["manifest"])
+                if verify:
+                    for message in result["verify"]["messages"]:
+                        print_func(message)
+                    if not result["verify"]["ok"]:
+                        raise nav_verify.VerificationFailed("Nav entries of the merged sites point to missing pages")
+                return None
+            batch = [
+                (queued_id, request) for queued_id, request in queue.pending() if request["unify_sites"] == unify_sites
+            ]
+            sites = list(dict.fromkeys(site for _, request in batch for site in request["sites"]))
+            if len(batch) > 1:
+                print_func(f"Merging {len(batch)} queued merge requests together")
+            result_requests = [
+                (queued_id, request)
+                for queued_id, request in batch
+                if queued_id != request_id and (request.get("manifest") or request.get("verify"))
+            ]
+            results = {queued_id: {} for queued_id, _ in result_requests}
+
+        if fast_yaml:
+            master_config = navyaml.MasterConfig(master_yaml)
+            master_data = master_config.data
+        else:
+            # Round-trip yaml loader to preserve formatting and comments
+            yaml = YAML()
+            with open(master_yaml) as master_file:
+                master_data = yaml.load(master_file)
+
+        master_docs_dir = master_data.get("docs_dir", "docs")
+        master_docs_root = os.path.join(target_site, master_docs_dir)
+
+        if output is not None:
+            # The files written by the merge are not linked
+            yaml_path = os.path.relpath(master_config.nav_document.path if fast_yaml else master_yaml, master_site)
+            for path in [yaml_path, os.path.normpath(master_docs_dir)]:
+                if path.startswith(os.pardir) or os.path.isabs(path):
+                    raise ValueError(
+                        'The master site uses "' + path + '", outside of the master site, '
+                        "which is not supported with an output directory"
+                    )
+            exclude = {yaml_path.replace(os.sep, "/"), STATE_DIR, master_data.get("site_dir", "site"), ".git"}
+            output_path = os.path.relpath(output, master_site)
+            if not output_path.startswith(os.pardir):
+                exclude.add(output_path.replace(os.sep, "/"))
+            mirrored = mirror.mirror_site(
+                master_site, output, exclude=exclude, link=link, state_path=os.path.join(state_dir, MIRROR_FILE)
+            )
+            print_func(
+                f'Linked the master site into "{output}": {len(mirrored.added)} added, '
+                f"{len(mirrored.modified)} updated and {len(mirrored.removed)} removed files"
+            )
 
-def merge_sites(sites, master_docs_root, unify_sites, print_func):
+        # Every completed site is recorded in a journal, so an interrupted merge
+        # can be resumed
+        journal = Journal(os.path.join(state_dir, JOURNAL_FILE), sites, unify_sites)
+        if resume:
+            if journal.resume():
+                print_func(f"Resuming the interrupted merge, {len(journal.completed)} sites were already merged")
+            else:
+                print_func("Could not find the journal of an interrupted merge with the same sites, merging all sites")
+        journal.start()
+
+        # Site bundles are downloaded (when modified) before merging, which also
+        # gives their site names
+        remote_sites = {}
+        urls = [site for site in sites if remote.is_remote(site) and journal.get(site) is None]
+        if urls:
+            cache_path = os.path.join(state_dir, REMOTE_CACHE_FILE)
+            cache = remote.load_cache(cache_path)
+            remote_sites = remote.fetch_sites(urls, master_docs_root, cache, print_func, max_connections=max_downloads)
+            remote.save_cache(cache_path, cache)
+
+        # Get site names that will be merged for deduplication
+        site_names_to_merge = get_site_names_from_sites(sites, print_func)
+        site_names_to_merge.update(fetched[0]["site_name"] for fetched in remote_sites.values() if fetched is not None)
+        site_names_to_merge.update(journal.get(site)["site_name"] for site in sites if journal.get(site) is not None)
+
+        if output is None:
+            old_nav = list(master_data[CONFIG_NAVIGATION])
+        else:
+            # The output is compared with its previous merge, not with the
+            # master site
+            output_yaml = os.path.join(output, yaml_path)
+            old_nav = navyaml.NavDocument(output_yaml).load_nav() if os.path.isfile(output_yaml) else []
+
+        # Remove existing entries for sites that are being re-merged to prevent
+        # duplication
+        if site_names_to_merge:
+            original_nav_count = len(master_data[CONFIG_NAVIGATION])
+            master_data[CONFIG_NAVIGATION] = remove_existing_sites_from_nav(
+                master_data[CONFIG_NAVIGATION], site_names_to_merge
+            )
+            removed_count = original_nav_count - len(master_data[CONFIG_NAVIGATION])
+            if removed_count > 0:
+                print_func(f"Removed {removed_count} existing site entries to prevent duplication")
+
+        # Get all site's navigation pages and copy their files
+        index = None
+        if tree_index:
+            index = tree.TreeIndex(os.path.join(state_dir, TREE_INDEX_FILE))
+        merged = []
+        new_navs = merge_sites(
+            sites,
+            master_docs_root,
+            unify_sites,
+            print_func,
+            progress=progress,
+            tree_index=index,
+            merged=merged,
+            scheduler=scheduler,
+            journal=journal,
+            remote_sites=remote_sites,
+        )
+        if index is not None:
+            index.save()
+
+        verified = True
+        verify_requests = [(queued_id, request) for queued_id, request in result_requests if request.get("verify")]
+        if verify or verify_requests:
+            reports = nav_verify.verify_sites(merged)
+        if verify:
+            verified = nav_verify.print_reports(reports, print_func)
+        for queued_id, request in verify_requests:
+            messages = []
+            ok = nav_verify.print_reports(nav_verify.select_reports(reports, request["sites"]), messages.append)
+            results[queued_id]["verify"] = {"ok": ok, "messages": messages}
+
+        # then add them to the master nav section
+        master_data[CONFIG_NAVIGATION] += new_navs
+
+        # Rewrite the master's mkdocs.yml, or write it in the output directory
+        # when its text changed
+        if fast_yaml:
+            master_config.save(None if output is None else os.path.join(output, yaml_path))
+        elif output is not None:
+            text = io.StringIO()
+            yaml.dump(master_data, text)
+            tree.write_text(os.path.join(output, MKDOCS_YML), text.getvalue())
+        else:
+            with open(master_yaml, "w") as master_file:
+                yaml.dump(master_data, master_file)
+        journal.clear()
+
+        # Sub-sites merged into the output by a previous merge but not by this
+        # one are removed, except for the files linked from the master site
+        if output is not None:
+            docs_path = os.path.normpath(master_docs_dir).replace(os.sep, "/")
+            site_roots = {merged_site.site_root for merged_site in merged}
+            mirrored_files = set(mirrored.added + mirrored.modified + mirrored.unchanged)
+            sites_path = os.path.join(state_dir, OUTPUT_SITES_FILE)
+            for site_root in sorted(_load_output_sites(sites_path) - site_roots):
+                removed = mirror.remove_unmirrored(output, docs_path + "/" + site_root, mirrored_files)
+                print_func(f'Removed the sub-site "{site_root}" not merged anymore: {len(removed)} files')
+            _save_output_sites(sites_path, site_roots)
+
+        # The changes are taken from the comparisons of the copy step, and the
+        # files the sites do not have anymore are deleted. The coalesced
+        # requests asking for a manifest get the part about their sites
+        manifest_requests = [(queued_id, request) for queued_id, request in result_requests if request.get("manifest")]
+        if manifest is not None or manifest_requests:
+            file_list = pages_manifest.FileList(os.path.join(state_dir, FILE_LIST_FILE))
+            changes = pages_manifest.build_manifest(merged, file_list, old_nav, master_data[CONFIG_NAVIGATION])
+            pages_manifest.remove_files(master_docs_root, changes)
+            if manifest is not None:
+                pages_manifest.write_manifest(manifest, changes)
+            for queued_id, request in manifest_requests:
+                results[queued_id]["manifest"] = pages_manifest.select_sites(changes, request["sites"])
+            file_list.save()
+
+        if coalesce:
+            for queued_id, result in results.items():
+                queue.save_result(queued_id, result)
+            queue.complete(queued_id for queued_id, _ in batch)
+        if not verified:
+            raise nav_verify.VerificationFailed("Nav entries of the merged sites point to missing pages")
+        return master_data
+
+
+def _load_output_sites(path):
+    """
+    Returns the site roots merged into an output directory by the previous
+    merge.
+    """
+    try:
+        with open(path) as sites_file:
+            return set(json.load(sites_file)["site_roots"])
+    except (OSError, ValueError, KeyError):
+        return set()
+
+
+def _save_output_sites(path, site_roots):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as sites_file:
+        json.dump({"site_roots": sorted(site_roots)}, sites_file)
+    os.replace(tmp_path, path)
+
+
+def merge_sites(
+    sites,
+    master_docs_root,
+    unify_sites,
+    print_func,
+    progress=None,
+    tree_index=None,
+    merged=None,
+    scheduler=None,
+    journal=None,
+    remote_sites=None,
+):
     """
     Copies the sites content to the master_docs_root and returns
-    the new merged "nav" pages to be added to the master yaml.
+    the new merged "nav" pages to be added to the master yaml. Files that
+    did not change since the previous merge are not copied again, and source
+    directories are not walked again when tree_index (a tree.TreeIndex) says
+    they did not change. If a "merged" list is given, a MergedSite record is
+    appended to it for every merged site. The files are copied through the
+    scheduler (a scheduler.IOScheduler) when one is given. With a journal
+    (a journal.Journal), completed sites are recorded in it and the sites it
+    already contains are not merged again, their recorded nav and copy result
+    are used instead.
+    The sites given as bundle URLs must have been fetched beforehand with
+    remote.fetch_sites, whose result is given as remote_sites.
     """
 
     new_navs = []
-    for site in sites:
+    events.emit(progress, events.MERGE_STARTED, total_sites=len(sites))
+    for index, site in enumerate(sites):
         print_func("\nAttempting to merge site: " + site)
-        site_yaml = os.path.join(site, MKDOCS_YML)
-        if not os.path.isfile(site_yaml):
-            print_func("Could not find the site yaml file, this site will be " 'skipped: "' + site_yaml + '"')
+        events.emit(progress, events.SITE_STARTED, site=site, index=index, total_sites=len(sites))
+        started = time.monotonic()
+
+        completed = journal.get(site) if journal is not None else None
+        if completed is not None:
+            merge_single_site(new_navs, completed["site_name"], completed["nav"], unify_sites)
+            # The files copied by the interrupted merge are still reported
+            if merged is not None and "copied" in completed:
+                copied = tree.CopyResult.from_dict(completed["copied"])
+                merged.append(
+                    MergedSite(site, completed["site_name"], completed["site_root"], completed["nav"], copied)
+                )
+            print_func('Site already merged by the interrupted merge: "' + site + '"')
+            events.emit(progress, events.SITE_SKIPPED, site=site, reason="Already merged")
             continue
 
-        with open(site_yaml) as site_file:
-            try:
-                yaml = YAML(typ="safe")
-                site_data = yaml.load(site_file)
-            except Exception:
-                print_func('Error loading the yaml file "' + site_yaml + '". ' "This site will be skipped.")
+        if remote.is_remote(site):
+            fetched = remote_sites.get(site) if remote_sites is not None else None
+            if fetched is None:
+                print_func('Could not fetch the site bundle, this site will be skipped: "' + site + '"')
+                events.emit(progress, events.SITE_SKIPPED, site=site, reason="Site bundle not fetched")
+                continue
+            site_data, copied = fetched
+            site_name = site_data["site_name"]
+            site_root = remote.get_site_root(site_name)
+        else:
+            local = _copy_local_site(site, master_docs_root, print_func, progress, tree_index, scheduler)
+            if local is None:
                 continue
+            site_data, site_name, site_root, copied = local
+
+        # Update the nav data with the new path after files have been copied
+        update_navs(site_data[CONFIG_NAVIGATION], site_root, print_func=print_func)
+        merge_single_site(new_navs, site_name, site_data[CONFIG_NAVIGATION], unify_sites)
+        if journal is not None:
+            journal.record(site, site_name, site_root, site_data[CONFIG_NAVIGATION], copied.to_dict())
+        if merged is not None:
+            merged.append(MergedSite(site, site_name, site_root, site_data[CONFIG_NAVIGATION], copied))
+
+        # Inform the user
+        print_func('Successfully merged site located in "' + site + '" as sub-site "' + site_name + '"\n')
+        events.emit(
+            progress,
+            events.SITE_FINISHED,
+            site=site,
+            site_name=site_name,
+            files=len(copied.copied),
+            unchanged=len(copied.unchanged),
+            bytes=copied.bytes,
+            seconds=round(time.monotonic() - started, 3),
+        )
+
+    events.emit(progress, events.MERGE_FINISHED, total_sites=len(sites))
+    return new_navs
 
-        # Check 'site_data' has the 'nav' mapping
-        if CONFIG_NAVIGATION not in site_data:
-            print_func(
-                'Could not find the "nav" entry in the yaml file: "' + site_yaml + '", this site will be skipped.'
-            )
-            if "pages" in site_data:
-                raise ValueError(
-                    "The site " + site_yaml + ' has the "pages" setting in the YAML file which is not '
-                    "supported since MkDocs 1.0 and is not supported anymore by MkDocs Merge. Please "
-                    "update your site to MkDocs 1.0 or higher."
-                )
 
+def load_site(site, print_func, progress=None, built=False):
+    """
+    Loads the mkdocs.yml of a local site.
+
+    Returns:
+        Tuple with the site data, the site name, the site root (the sub-path
+        of the site in the master site) and the path of the site's docs_dir,
+        or of its site_dir if built is True, or None if the site has to be
+        skipped
+    """
+    site_yaml = os.path.join(site, MKDOCS_YML)
+    if not os.path.isfile(site_yaml):
+        print_func("Could not find the site yaml file, this site will be " 'skipped: "' + site_yaml + '"')
+        events.emit(progress, events.SITE_SKIPPED, site=site, reason="Site yaml file not found")
+        return None
+
+    with open(site_yaml) as site_file:
         try:
-            site_name = str(site_data["site_name"])
+            yaml = YAML(typ="safe")
+            site_data = yaml.load(site_file)
         except Exception:
-            site_name = os.path.basename(site)
-            print_func(
-                'Could not find the "site_name" property in the yaml file. '
-                'Defaulting the site folder name to: "' + site_name + '"'
+            print_func('Error loading the yaml file "' + site_yaml + '". ' "This site will be skipped.")
+            events.emit(progress, events.SITE_SKIPPED, site=site, reason="Invalid site yaml file")
+            return None
+
+    # Check 'site_data' has the 'nav' mapping
+    if CONFIG_NAVIGATION not in site_data:
+        print_func('Could not find the "nav" entry in the yaml file: "' + site_yaml + '", this site will be skipped.')
+        if "pages" in site_data:
+            raise ValueError(
+                "The site " + site_yaml + ' has the "pages" setting in the YAML file which is not '
+                "supported since MkDocs 1.0 and is not supported anymore by MkDocs Merge. Please "
+                "update your site to MkDocs 1.0 or higher."
             )
 
-        site_root = site_name.replace(" ", "_").lower()
-        site_docs_dir = site_data.get("docs_dir", "docs")
+    try:
+        site_name = str(site_data["site_name"])
+    except Exception:
+        site_name = os.path.basename(site)
+        print_func(
+            'Could not find the "site_name" property in the yaml file. '
+            'Defaulting the site folder name to: "' + site_name + '"'
+        )
 
-        # Copy site's files into the master site's "docs" directory
-        old_site_docs = os.path.join(site, site_docs_dir)
-        new_site_docs = os.path.join(master_docs_root, site_root)
+    site_root = site_name.replace(" ", "_").lower()
+    if built:
+        site_dir = os.path.join(site, site_data.get("site_dir", "site"))
+        if not os.path.isdir(site_dir):
+            print_func('Could not find the built site "site_dir" folder. This site will be skipped: ' + site_dir)
+            events.emit(progress, events.SITE_SKIPPED, site=site, reason="Site site_dir not found")
+            return None
+        return site_data, site_name, site_root, site_dir
+
+    site_docs_dir = site_data.get("docs_dir", "docs")
+    old_site_docs = os.path.join(site, site_docs_dir)
+
+    if not os.path.isdir(old_site_docs):
+        print_func('Could not find the site "docs_dir" folder. This site will ' "be skipped: " + old_site_docs)
+        events.emit(progress, events.SITE_SKIPPED, site=site, reason="Site docs_dir not found")
+        return None
 
-        if not os.path.isdir(old_site_docs):
-            print_func('Could not find the site "docs_dir" folder. This site will ' "be skipped: " + old_site_docs)
-            continue
+    return site_data, site_name, site_root, old_site_docs
 
-        try:
-            # Update if the directory already exists to allow site unification
-            shutil.copytree(old_site_docs, new_site_docs, dirs_exist_ok=True)
-        except OSError as exc:
-            print_func('Error copying files of site "' + site_name + '". This site will be skipped.')
-            print_func(exc.strerror)
-            continue
 
-        # Update the nav data with the new path after files have been copied
-        update_navs(site_data[CONFIG_NAVIGATION], site_root, print_func=print_func)
-        merge_single_site(new_navs, site_name, site_data[CONFIG_NAVIGATION], unify_sites)
+def make_copy_function(site, site_docs, progress=None, scheduler=None):
+    """
+    Returns the function used by tree.copy_tree to copy the files of a site,
+    through the scheduler if one is given, emitting the progress events.
+    """
 
-        # Inform the user
-        print_func('Successfully merged site located in "' + site + '" as sub-site "' + site_name + '"\n')
+    def file_copied(src, dst, size):
+        events.emit(
+            progress,
+            events.FILE_COPIED,
+            site=site,
+            path=os.path.relpath(src, site_docs).replace(os.sep, "/"),
+            bytes=size,
+        )
 
-    return new_navs
+    def copy_file(src, dst, size):
+        if scheduler is None:
+            tree.copy_file(src, dst, size)
+            file_copied(src, dst, size)
+        else:
+            scheduler.submit(src, dst, size, callback=file_copied)
+
+    return copy_file
+
+
+def _copy_local_site(site, master_docs_root, print_func, progress, tree_index, scheduler):
+    """
+    Loads the mkdocs.yml of a local site and copies its docs_dir into the
+    master_docs_root. Returns the site data, name, root and tree.CopyResult,
+    or None if the site has to be skipped.
+    """
+    loaded = load_site(site, print_func, progress)
+    if loaded is None:
+        return None
+    site_data, site_name, site_root, old_site_docs = loaded
+
+    # Copy site's files into the master site's "docs" directory
+    new_site_docs = os.path.join(master_docs_root, site_root)
+
+    copy_file = make_copy_function(site, old_site_docs, progress, scheduler)
+    try:
+        # Update if the directory already exists to allow site unification
+        copied = tree.copy_tree(old_site_docs, new_site_docs, index=tree_index, copy_function=copy_file)
+        if scheduler is not None:
+            scheduler.wait()
+    except OSError as exc:
+        # The directories were indexed when their copies were queued, the
+        # files that failed must be copied again by the next merge
+        if tree_index is not None:
+            tree_index.forget_tree(old_site_docs)
+        print_func('Error copying files of site "' + site_name + '". This site will be skipped.')
+        print_func(exc.strerror)
+        events.emit(progress, events.ERROR, site=site, message=str(exc))
+        events.emit(progress, events.SITE_SKIPPED, site=site, reason="Error copying files")
+        return None
+
+    return site_data, site_name, site_root, copied
 
 
 def merge_single_site(global_nav, site_name, site_nav, unify_sites):
@@ -0,0 +1,154 @@
+"""
+Mirror of the master site in an output directory, for merges that leave the
+master site untouched (the output option of run_merge).
+
+The files of the master site are hard links (or symbolic links) to the
+originals instead of copies, and the merge then writes into the output
+directory, replacing a link instead of writing through it. Repeated mirrors
+only create, replace or remove the links whose source changed.
+"""
+
+import json
+import os
+
+from mkdocsmerge import tree
+
+LINK_MODES = ("hardlink", "symlink")
+
+
+class MirrorResult:
+    """
+    Outcome of mirroring a directory, paths are relative to it and use "/" as
+    separator.
+    """
+
+    def __init__(self):
+        self.added = []
+        self.modified = []
+        self.unchanged = []
+        self.removed = []
+
+
+def mirror_site(src, dst, exclude=(), link="hardlink", state_path=None):
+    """
+    Mirrors the src directory into dst with links to its files.
+
+    Args:
+        src: Directory to mirror
+        dst: Output directory, created if needed
+        exclude: Relative paths (using "/") of the files and folders not to
+                 mirror
+        link: "hardlink" or "symlink". Hard links fall back to symbolic links
+              when they cannot be created (e.g. across filesystems)
+        state_path: Optional file where the mirrored files are recorded, so
+                    the links of files removed from src are removed from dst
+                    by the next mirror
+
+    Returns:
+        MirrorResult with the added, modified (relinked), unchanged and removed
+        files
+    """
+    if link not in LINK_MODES:
+        raise ValueError('Unknown link mode "' + link + '", use one of: ' + ", ".join(LINK_MODES))
+
+    result = MirrorResult()
+    _mirror_dir(os.path.abspath(src), dst, "", set(exclude), link, result)
+
+    if state_path is not None:
+        previous = []
+        try:
+            with open(state_path) as state_file:
+                previous = json.load(state_file)["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+        mirrored = set(result.added + result.modified + result.unchanged)
+        for rel_path in sorted(set(previous) - mirrored):
+            path = os.path.join(dst, *rel_path.split("/"))
+            if os.path.lexists(path):
+                os.unlink(path)
+                result.removed.append(rel_path)
+                _remove_empty_dirs(os.path.dirname(path), dst)
+
+        os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, "w") as state_file:
+            json.dump({"files": sorted(mirrored)}, state_file)
+        os.replace(tmp_path, state_path)
+
+    return result
+
+
+def remove_unmirrored(dst, rel_dir, mirrored):
+    """
+    Removes the files of the rel_dir folder of dst (a relative path using "/")
+    that are not in the mirrored files, and the folders left empty.
+
+    Returns:
+        List with the relative paths of the removed files
+    """
+    removed = []
+    top = os.path.join(dst, *rel_dir.split("/"))
+    for dirpath, dirnames, filenames in os.walk(top, topdown=False):
+        rel = os.path.relpath(dirpath, dst).replace(os.sep, "/") + "/"
+        for filename in sorted(filenames):
+            if rel + filename not in mirrored:
+                os.unlink(os.path.join(dirpath, filename))
+                removed.append(rel + filename)
+        if not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    return removed
+
+
+def _remove_empty_dirs(directory, top):
+    top = os.path.abspath(top)
+    while os.path.abspath(directory) != top:
+        try:
+            os.rmdir(directory)
+        except OSError:
+            # Not empty
+            return
+        directory = os.path.dirname(directory)
+
+
+def _mirror_dir(src, dst, rel, exclude, link, result):
+    os.makedirs(dst, exist_ok=True)
+    with os.scandir(src) as entries:
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            rel_path = rel + entry.name
+            if rel_path in exclude:
+                continue
+            target = os.path.join(dst, entry.name)
+            if entry.is_dir():
+                _mirror_dir(entry.path, target, rel_path + "/", exclude, link, result)
+                continue
+
+            state = _link_state(entry, target, link)
+            if state != "unchanged":
+                tree.unlink_shared(target)
+                if os.path.lexists(target):
+                    os.unlink(target)
+                _link(entry.path, target, link)
+            getattr(result, state).append(rel_path)
+
+
+def _link_state(entry, target, link):
+    try:
+        target_stat = os.lstat(target)
+    except FileNotFoundError:
+        return "added"
+    if os.path.islink(target):
+        same = os.readlink(target) == entry.path
+    else:
+        src_stat = entry.stat()
+        same = link == "hardlink" and (target_stat.st_ino, target_stat.st_dev) == (src_stat.st_ino, src_stat.st_dev)
+    return "unchanged" if same else "modified"
+
+
+def _link(src, target, link):
+    if link == "hardlink":
+        try:
+            os.link(src, target)
+            return
+        except OSError:
+            pass
+    os.symlink(src, target)
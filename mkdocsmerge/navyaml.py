@@ -0,0 +1,312 @@
+"""
+Fast read and write of the nav of large master mkdocs.yml files.
+
+Instead of a round-trip load and dump of the whole document, the top-level
+"nav" block is located in the text, only that block is parsed with the safe
+loader, and only that block is emitted again when writing. The text outside
+the nav block, with its comments and formatting, is written back as it was.
+
+When the master mkdocs.yml has no nav but inherits another configuration file
+with "INHERIT" (an MkDocs feature), the nav is read from and written to the
+inherited file.
+"""
+
+import json
+import os
+import re
+
+from ruamel.yaml import YAML
+
+from mkdocsmerge import tree
+
+NAV_KEY = re.compile(r"^nav\s*:")
+ITEM_INDENT = re.compile(r"^( *)- ")
+ITEM_LINE = re.compile(r"^( *)- ?(.*)$")
+PLAIN_SCALAR = re.compile(r"^[A-Za-z_/][\w ./()+-]*$")
+# Plain scalars starting with a digit, dot or sign are strings when they hold
+# a path separator, a space or a file extension, otherwise they may be numbers.
+# A "-" followed by a space is a sequence indicator, not the start of a scalar
+PATH_SCALAR = re.compile(r"^(?:[\w./()+]|-(?! ))[\w ./()+-]*$")
+PATH_HINT = re.compile(r"[/ (]|\w\.(?![eE][0-9]*$)[A-Za-z]\w*$")
+# Characters JSON strings keep as they are, but YAML reads as line breaks (NEL,
+# LS, PS) or does not allow unescaped (the other non-printable ones)
+YAML_ESCAPED = re.compile("[\x7f-\x9f\u2028\u2029\ud800-\udfff\ufffe\uffff]")
+RESERVED_SCALARS = {"true", "false", "yes", "no", "on", "off", "y", "n", "null"}
+
+
+class _Unsupported(Exception):
+    """
+    The nav block uses YAML syntax the fast parser does not handle.
+    """
+
+
+class NavDocument:
+    """
+    YAML file split around its top-level nav block.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path) as yaml_file:
+            self.lines = yaml_file.read().splitlines(keepends=True)
+        self.start, self.end = find_nav_block(self.lines)
+
+    @property
+    def has_nav(self):
+        return self.start is not None
+
+    def load_rest(self):
+        """
+        Loads the document without its nav block, keeping custom tags.
+        """
+        before, _, after = self.split()
+        return YAML().load("".join(before + after)) or {}
+
+    def load_nav(self):
+        _, block, _ = self.split()
+        if not block:
+            return []
+        try:
+            return parse_nav(block)
+        except _Unsupported:
+            return YAML(typ="safe").load("".join(block))["nav"] or []
+
+    def split(self):
+        """
+        Returns the lines before, in and after the nav block.
+        """
+        if not self.has_nav:
+            return self.lines, [], []
+        start, end = self.start, self.end
+        return self.lines[:start], self.lines[start:end], self.lines[end:]
+
+    def save_nav(self, nav, path=None):
+        """
+        Writes the document back, re-emitting only the nav block. With a path,
+        the document is written there instead, only if its text changed.
+        """
+        before, block, after = self.split()
+        indent = 2
+        for line in block[1:]:
+            match = ITEM_INDENT.match(line)
+            if match:
+                indent = len(match.group(1))
+                break
+        if before and not before[-1].endswith("\n"):
+            before = before[:-1] + [before[-1] + "\n"]
+        nav_text = dump_nav(nav, indent)
+
+        if path is not None:
+            tree.write_text(path, "".join(before) + nav_text + "".join(after))
+            return
+
+        with open(self.path, "w") as yaml_file:
+            yaml_file.writelines(before)
+            yaml_file.write(nav_text)
+            yaml_file.writelines(after)
+
+        self.lines = before + nav_text.splitlines(keepends=True) + after
+        self.start, self.end = find_nav_block(self.lines)
+
+
+class MasterConfig:
+    """
+    Master site configuration loaded with the fast nav path. The data
+    attribute holds the configuration with the nav, as run_merge expects.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        document = NavDocument(path)
+        self.data = document.load_rest()
+
+        # Look for the nav along the INHERIT chain
+        self.nav_document = document
+        nav_document = document
+        seen = {os.path.abspath(path)}
+        while not nav_document.has_nav:
+            parent = nav_document.load_rest().get("INHERIT")
+            if not parent:
+                break
+            parent_path = os.path.normpath(os.path.join(os.path.dirname(nav_document.path), parent))
+            if os.path.abspath(parent_path) in seen or not os.path.isfile(parent_path):
+                break
+            seen.add(os.path.abspath(parent_path))
+            nav_document = NavDocument(parent_path)
+            if nav_document.has_nav:
+                self.nav_document = nav_document
+
+        self.data["nav"] = self.nav_document.load_nav()
+
+    def save(self, path=None):
+        """
+        Writes the nav back to the file holding it, or to path instead.
+        """
+        self.nav_document.save_nav(self.data["nav"], path)
+
+
+def find_nav_block(lines):
+    """
+    Returns the (start, end) line range of the top-level nav block, or
+    (None, None) if there is none. Blank and comment lines at the end of the
+    block are left out of it.
+    """
+    start = next((number for number, line in enumerate(lines) if NAV_KEY.match(line)), None)
+    if start is None:
+        return None, None
+
+    end = start + 1
+    while end < len(lines):
+        line = lines[end]
+        is_item = line.startswith("- ") or line.rstrip() == "-"
+        if line.strip() and not line[0].isspace() and not line.startswith("#") and not is_item:
+            break
+        end += 1
+    while end > start + 1 and (not lines[end - 1].strip() or lines[end - 1].lstrip().startswith("#")):
+        end -= 1
+    return start, end
+
+
+def parse_nav(lines):
+    """
+    Parses a nav block written in the block style used by MkDocs sites:
+    sequences of pages, each one a scalar or a single-key mapping. Raises
+    _Unsupported for anything else (flow style, anchors, comments after
+    values...), which is then parsed by the YAML loader.
+    """
+    if lines[0].rstrip() != "nav:":
+        raise _Unsupported()
+    items = []
+    for line in lines[1:]:
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        match = ITEM_LINE.match(line.rstrip())
+        if not match or "#" in line or "\t" in line:
+            raise _Unsupported()
+        items.append((len(match.group(1)), match.group(2)))
+    if not items:
+        return []
+
+    nav, position = _parse_sequence(items, 0, items[0][0])
+    if position != len(items):
+        raise _Unsupported()
+    return nav
+
+
+def _parse_sequence(items, position, indent):
+    sequence = []
+    while position < len(items) and items[position][0] == indent:
+        content = items[position][1]
+        position += 1
+        key, rest = _parse_scalar(content)
+        if not rest:
+            sequence.append(key)
+        elif rest == ":":
+            if position >= len(items) or items[position][0] < indent + 2:
+                raise _Unsupported()
+            children, position = _parse_sequence(items, position, items[position][0])
+            sequence.append({key: children})
+        elif rest.startswith(": "):
+            value, rest = _parse_scalar(rest[2:].lstrip())
+            if rest:
+                raise _Unsupported()
+            sequence.append({key: value})
+        else:
+            raise _Unsupported()
+    if position < len(items) and items[position][0] > indent:
+        raise _Unsupported()
+    return sequence, position
+
+
+def _parse_scalar(text):
+    """
+    Returns a string scalar at the start of text and the rest of the text.
+    """
+    if text.startswith('"'):
+        try:
+            value, end = json.JSONDecoder().raw_decode(text)
+        except ValueError:
+            raise _Unsupported()
+        return value, text[end:].rstrip()
+    if text.startswith("'"):
+        end = 1
+        while True:
+            end = text.find("'", end)
+            if end == -1:
+                raise _Unsupported()
+            if not text.startswith("'", end + 1):
+                break
+            end += 2
+        value, rest = text[1:end], text[end:]
+        return value.replace("''", "'"), rest[1:].rstrip()
+
+    separator = text.find(": ")
+    if separator == -1:
+        separator = len(text) - 1 if text.endswith(":") else len(text)
+    value = text[:separator].rstrip()
+    if not _is_plain_string(value):
+        raise _Unsupported()
+    return value, text[separator:]
+
+
+def _is_plain_string(value):
+    if PLAIN_SCALAR.match(value):
+        return value.lower() not in RESERVED_SCALARS
+    return bool(PATH_SCALAR.match(value) and PATH_HINT.search(value))
+
+
+def dump_nav(nav, indent=2):
+    """
+    Emits a nav in block style. Much faster than a generic YAML dump, as nav
+    entries are only sequences, mappings and scalars.
+    """
+    out = ["nav:"]
+    if nav:
+        _emit_sequence(nav, indent, out)
+    else:
+        out[0] += " []"
+    return "\n".join(out) + "\n"
+
+
+def _emit_sequence(sequence, indent, out):
+    for item in sequence:
+        prefix = " " * indent + "- "
+        if isinstance(item, dict) and item:
+            lead = prefix
+            for key, value in item.items():
+                _emit_pair(lead, key, value, indent + 2, out)
+                lead = " " * (indent + 2)
+        elif isinstance(item, list) and item:
+            out.append(prefix.rstrip())
+            _emit_sequence(item, indent + 4, out)
+        else:
+            out.append(prefix + _scalar(item))
+
+
+def _emit_pair(lead, key, value, column, out):
+    if isinstance(value, list) and value:
+        out.append(lead + _scalar(key) + ":")
+        _emit_sequence(value, column + 2, out)
+    elif isinstance(value, dict) and value:
+        out.append(lead + _scalar(key) + ":")
+        for child_key, child_value in value.items():
+            _emit_pair(" " * (column + 2), child_key, child_value, column + 2, out)
+    else:
+        out.append(lead + _scalar(key) + ": " + _scalar(value))
+
+
+def _scalar(value):
+    if isinstance(value, list):
+        return "[]"
+    if isinstance(value, dict):
+        return "{}"
+    if not isinstance(value, str):
+        value = value if isinstance(value, (bool, int, float)) or value is None else str(value)
+        return json.dumps(value)
+    if value == value.strip() and _is_plain_string(value):
+        return value
+    # JSON strings are valid YAML double-quoted scalars, once the characters
+    # YAML handles differently are escaped
+    text = json.dumps(value, ensure_ascii=False)
+    return YAML_ESCAPED.sub(lambda match: "\\u%04x" % ord(match.group()), text)
@@ -0,0 +1,95 @@
+"""
+MkDocs plugin merging sites into the master site at build time, without
+copying their files or rewriting the master mkdocs.yml.
+
+Usage, in the master site's mkdocs.yml (site paths are relative to it):
+
+    plugins:
+      - mkdocs-merge:
+          sites:
+            - ../project_a
+            - ../project_b
+          unify_sites: true
+"""
+
+import logging
+import os
+
+from mkdocs.config import config_options
+from mkdocs.exceptions import PluginError
+from mkdocs.plugins import BasePlugin
+from mkdocs.structure.files import File
+
+from mkdocsmerge import merge
+
+log = logging.getLogger("mkdocs.plugins.mkdocs-merge")
+
+
+class MergePlugin(BasePlugin):
+    """
+    Adds the nav of every site to the master nav and their pages to the
+    build, read from their original location.
+    """
+
+    config_scheme = (
+        ("sites", config_options.Type(list, default=[])),
+        ("unify_sites", config_options.Type(bool, default=False)),
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.sites = []
+
+    def on_config(self, config, **kwargs):
+        base_dir = os.path.dirname(config["config_file_path"] or "")
+        sites = [os.path.join(base_dir, site) for site in self.config["sites"]]
+
+        self.sites = []
+        new_navs = []
+        for site in sites:
+            try:
+                loaded = merge.load_site(site, log.warning)
+            except ValueError as exc:
+                raise PluginError(str(exc))
+            if loaded is None or merge.CONFIG_NAVIGATION not in loaded[0]:
+                continue
+            site_data, site_name, site_root, site_docs = loaded
+
+            merge.update_navs(site_data[merge.CONFIG_NAVIGATION], site_root, print_func=log.warning)
+            merge.merge_single_site(
+                new_navs, site_name, site_data[merge.CONFIG_NAVIGATION], self.config["unify_sites"]
+            )
+            self.sites.append((site_root, site_docs))
+            log.info(f'Merging site "{site}" as sub-site "{site_name}"')
+
+        # Without a nav in the master site, MkDocs builds it from all the files
+        if config["nav"] is not None:
+            site_names = {name for page in new_navs for name in page}
+            config["nav"] = merge.remove_existing_sites_from_nav(config["nav"], site_names) + new_navs
+        return config
+
+    def on_files(self, files, config, **kwargs):
+        for site_root, site_docs in self.sites:
+            for dirpath, dirnames, filenames in os.walk(site_docs):
+                # Same as MkDocs, hidden files and folders are ignored
+                dirnames[:] = sorted(name for name in dirnames if not name.startswith("."))
+                for filename in sorted(filenames):
+                    if filename.startswith("."):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    src_uri = site_root + "/" + os.path.relpath(path, site_docs).replace(os.sep, "/")
+
+                    existing = files.get_file_from_path(src_uri)
+                    if existing is not None:
+                        files.remove(existing)
+                    page_file = File(src_uri, config["docs_dir"], config["site_dir"], config["use_directory_urls"])
+                    page_file.abs_src_path = os.path.abspath(path)
+                    files.append(page_file)
+        return files
+
+    def on_serve(self, server, config, builder, **kwargs):
+        # Rebuild when the merged sites change, only the modified pages are
+        # rebuilt with "mkdocs serve --dirty"
+        for _, site_docs in self.sites:
+            server.watch(site_docs)
+        return server
@@ -0,0 +1,361 @@
+"""
+Post-build merge of sites already built by their own pipelines: the HTML of
+every site is placed under its site_root in the built master site and the
+search indexes are merged, instead of rebuilding the whole merged site from
+markdown. Only the pages of the master site are built, with links to the
+merged sites added to its nav.
+
+The search indexes are streamed one document at a time, so they are never
+loaded in memory, and the HTML files unchanged since the previous merge are
+not copied again.
+"""
+
+import json
+import logging
+import os
+import posixpath
+import time
+
+from mkdocs.commands.build import build
+from mkdocs.config import load_config
+
+from mkdocsmerge import events
+from mkdocsmerge import lock
+from mkdocsmerge import merge
+from mkdocsmerge import tree
+from mkdocsmerge.manifest import nav_entries
+from mkdocsmerge.verify import PAGE_EXTENSIONS
+
+SEARCH_INDEX = os.path.join("search", "search_index.json")
+# Folder of the master site state directory where the master site is built
+# before being copied to its site_dir
+BUILD_DIR = "prebuilt-site"
+CHUNK_SIZE = 64 * 1024
+JSON_WHITESPACE = " \t\r\n"
+
+
+def run_prebuilt_merge(master_site, sites, unify_sites, print_func, progress=None, scheduler=None):
+    """
+    Merges the built output of multiple MkDocs sites into the master site,
+    which is built with the links to the merged sites added to its nav. The
+    master mkdocs.yml is not modified.
+
+    The master site_dir ends up as after a clean build: the files of the
+    sites merged by a previous run but not by this one are removed, as are
+    their search index entries.
+
+    Args:
+        master_site: Path to the master site directory
+        sites: List of site directory paths, each one with its mkdocs.yml and
+               its built site_dir
+        unify_sites: If True, sites with the same name within a single merge
+                     operation will be unified
+        print_func: Function to use for printing status messages
+        progress: Optional callback receiving structured progress events
+        scheduler: Optional scheduler.IOScheduler used to copy the files
+
+    Returns:
+        MkDocs configuration the master site was built with
+    """
+    if not sites:
+        print_func(
+            "Please specify one or more sites to merge to the master "
+            'site.\nUse "mkdocs-merge prebuilt -h" for more information.'
+        )
+        return None
+
+    master_yaml = os.path.join(master_site, merge.MKDOCS_YML)
+    if not os.path.isfile(master_yaml):
+        print_func("Could not find the master site yml file, " "make sure it exists: " + master_yaml)
+        events.emit(progress, events.ERROR, site=master_site, message="Master site yml file not found")
+        return None
+
+    # Merges into the same master site wait for each other
+    with lock.MasterLock(os.path.join(master_site, merge.STATE_DIR, merge.LOCK_FILE)):
+        config = load_config(config_file=master_yaml)
+        master_site_dir = config["site_dir"]
+
+        new_navs = []
+        site_indexes = []
+        kept = set()
+        events.emit(progress, events.MERGE_STARTED, total_sites=len(sites))
+        for index, site in enumerate(sites):
+            print_func("\nAttempting to merge prebuilt site: " + site)
+            events.emit(progress, events.SITE_STARTED, site=site, index=index, total_sites=len(sites))
+            started = time.monotonic()
+
+            loaded = merge.load_site(site, print_func, progress, built=True)
+            if loaded is None or merge.CONFIG_NAVIGATION not in loaded[0]:
+                continue
+            site_data, site_name, site_root, built_dir = loaded
+
+            copy_file = merge.make_copy_function(site, built_dir, progress, scheduler)
+            try:
+                copied = tree.copy_tree(built_dir, os.path.join(master_site_dir, site_root), copy_function=copy_file)
+                if scheduler is not None:
+                    scheduler.wait()
+            except OSError as exc:
+                print_func('Error copying files of site "' + site_name + '". This site will be skipped.')
+                print_func(exc.strerror)
+                events.emit(progress, events.ERROR, site=site, message=str(exc))
+                events.emit(progress, events.SITE_SKIPPED, site=site, reason="Error copying files")
+                continue
+
+            # The pages are linked as built by the site, with its own URL style
+            use_directory_urls = site_data.get("use_directory_urls", True)
+            site_nav = nav_urls(site_data[merge.CONFIG_NAVIGATION], site_root, use_directory_urls)
+            merge.merge_single_site(new_navs, site_name, site_nav, unify_sites)
+            site_indexes.append((site_name, site_root, os.path.join(built_dir, SEARCH_INDEX)))
+            kept.update(site_root + "/" + path for path in copied.files)
+
+            print_func('Successfully merged prebuilt site located in "' + site + '" as sub-site "' + site_name + '"\n')
+            events.emit(
+                progress,
+                events.SITE_FINISHED,
+                site=site,
+                site_name=site_name,
+                files=len(copied.copied),
+                unchanged=len(copied.unchanged),
+                bytes=copied.bytes,
+                seconds=round(time.monotonic() - started, 3),
+            )
+        events.emit(progress, events.MERGE_FINISHED, total_sites=len(sites))
+
+        # Without a nav in the master site, MkDocs builds it from its files only
+        site_names = {site_name for site_name, _, _ in site_indexes}
+        if config["nav"] is not None:
+            config["nav"] = merge.remove_existing_sites_from_nav(config["nav"], site_names) + new_navs
+        else:
+            print_func("The master site has no nav, the merged sites are not linked from its pages")
+        build_dir = os.path.join(master_site, merge.STATE_DIR, BUILD_DIR)
+        kept.update(build_master(config, build_dir, new_navs, master_site_dir).files)
+
+        master_index = os.path.join(build_dir, SEARCH_INDEX)
+        if os.path.isfile(master_index):
+            indexes = [(site_root, path) for _, site_root, path in site_indexes if os.path.isfile(path)]
+            merge_search_indexes(master_index, indexes, os.path.join(master_site_dir, SEARCH_INDEX))
+        else:
+            print_func("The master site has no search index, search indexes are not merged")
+
+        removed = remove_stale_files(master_site_dir, kept)
+        if removed:
+            print_func(f"Removed {removed} files not part of the merged site anymore")
+        return config
+
+
+def build_master(config, build_dir, site_navs, site_dir):
+    """
+    Builds the master site with its MkDocs configuration in build_dir, then
+    copies the files that changed to its site_dir. The links to the merged
+    sites (site_navs) are not found in the master docs, the warnings MkDocs
+    logs about them are left out so strict builds do not fail.
+
+    Returns:
+        tree.CopyResult of the master files copied to the site_dir
+    """
+    links = {"'" + url + "'" for _, url in nav_entries(site_navs)}
+    nav_log = logging.getLogger("mkdocs.structure.nav")
+    links_filter = _LinksFilter(links)
+
+    config["site_dir"] = build_dir
+    nav_log.addFilter(links_filter)
+    try:
+        build(config)
+    finally:
+        nav_log.removeFilter(links_filter)
+        config["site_dir"] = site_dir
+    return tree.copy_tree(build_dir, site_dir)
+
+
+def remove_stale_files(site_dir, kept):
+    """
+    Removes the files of the site_dir not in kept (relative paths using "/"),
+    and the folders left empty. As with MkDocs, hidden files and folders at
+    the top of the site_dir are kept.
+
+    Returns:
+        Number of removed files
+    """
+    removed = 0
+    for dirpath, dirnames, filenames in os.walk(site_dir, topdown=False):
+        rel_dir = os.path.relpath(dirpath, site_dir).replace(os.sep, "/")
+        prefix = "" if rel_dir == "." else rel_dir + "/"
+        if prefix.startswith("."):
+            continue
+        for filename in filenames:
+            if not prefix and filename.startswith("."):
+                continue
+            if prefix + filename not in kept:
+                os.unlink(os.path.join(dirpath, filename))
+                removed += 1
+        if prefix and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    return removed
+
+
+class _LinksFilter(logging.Filter):
+    """
+    Drops the log records about the given nav links.
+    """
+
+    def __init__(self, links):
+        super().__init__()
+        self.links = links
+
+    def filter(self, record):
+        message = record.getMessage()
+        return not any(link in message for link in self.links)
+
+
+def nav_urls(nav, site_root, use_directory_urls):
+    """
+    Returns a copy of a site nav with its pages replaced by the URLs of their
+    built HTML under the site_root. External links are kept.
+    """
+    if isinstance(nav, list):
+        return [nav_urls(item, site_root, use_directory_urls) for item in nav]
+    if isinstance(nav, dict):
+        return {name: nav_urls(value, site_root, use_directory_urls) for name, value in nav.items()}
+    if not isinstance(nav, str) or "://" in nav or nav.startswith("/"):
+        return nav
+
+    path = nav.replace("\\", "/")
+    base, extension = posixpath.splitext(path)
+    if extension.lower() not in PAGE_EXTENSIONS:
+        return site_root + "/" + path
+
+    # Same URLs as MkDocs, index and README pages are their folder's index
+    directory, name = posixpath.split(base)
+    if name in ("index", "README"):
+        url = posixpath.join(directory, "index.html")
+        if use_directory_urls:
+            url = directory + "/" if directory else ""
+    else:
+        url = base + "/" if use_directory_urls else base + ".html"
+    return site_root + "/" + url
+
+
+def merge_search_indexes(master_index, site_indexes, output):
+    """
+    Writes the master search index with the docs of the site search indexes,
+    their locations moved under the site roots. The lunr index prebuilt for
+    the master docs only (prebuild_index option of the search plugin) is
+    left out when site docs are merged, the search then builds the index of
+    all the docs in the browser.
+
+    Args:
+        master_index: Path of the search index of the built master site
+        site_indexes: List of (site_root, path) tuples of the site indexes
+        output: Path of the merged search index, can be master_index
+
+    Returns:
+        Number of docs in the merged index
+    """
+    members = {}
+    count = 0
+    tmp_path = output + ".tmp"
+    with open(tmp_path, "w") as output_file:
+        output_file.write('{"docs": [')
+        for site_root, path in [(None, master_index)] + list(site_indexes):
+            with open(path) as index_file:
+                for key, value in iter_search_index(index_file):
+                    if key != "docs":
+                        # The config and other members are the master's ones
+                        if site_root is None and not (key == "index" and site_indexes):
+                            members[key] = value
+                        continue
+                    if site_root is not None:
+                        value["location"] = site_root + "/" + value.get("location", "")
+                    output_file.write((", " if count else "") + json.dumps(value))
+                    count += 1
+        output_file.write("]")
+        for key, value in members.items():
+            output_file.write(", " + json.dumps(key) + ": " + json.dumps(value))
+        output_file.write("}")
+    os.replace(tmp_path, output)
+    return count
+
+
+def iter_search_index(stream):
+    """
+    Reads a search index from a text stream, yielding ("docs", doc) for every
+    doc of its docs list and (key, value) for its other members, without
+    loading the whole file.
+    """
+    reader = _JsonReader(stream)
+    reader.expect("{")
+    while reader.peek() != "}":
+        key = reader.value()
+        reader.expect(":")
+        if key == "docs":
+            reader.expect("[")
+            while reader.peek() != "]":
+                yield key, reader.value()
+                reader.skip(",")
+            reader.expect("]")
+        else:
+            yield key, reader.value()
+        reader.skip(",")
+    reader.expect("}")
+
+
+class _JsonReader:
+    """
+    Incremental reader of JSON values from a text stream, read in chunks.
+    """
+
+    decoder = json.JSONDecoder()
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.stream.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        start = self.position
+        self.buffer = self.buffer[start:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        """
+        Returns the next non-whitespace character, an empty string at the
+        end of the stream.
+        """
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in JSON_WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Invalid search index, expected {char!r} at {self.peek()!r}")
+        self.position += 1
+
+    def skip(self, char):
+        if self.peek() == char:
+            self.position += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # The value may continue in the next chunk
+                if self._fill():
+                    continue
+                raise
+            # A number may also continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.position = end
+            return value
@@ -0,0 +1,288 @@
+"""
+Sites published as bundles on an HTTP server.
+
+A bundle is a tar archive, optionally compressed, with the site's mkdocs.yml
+and its docs_dir at the root (e.g. created with "tar -czf site.tar.gz
+mkdocs.yml docs"). Bundles are streamed straight into the master site's docs
+directory, and the ETag and Last-Modified headers of every bundle are cached
+in the master site so unchanged bundles are not downloaded again.
+"""
+
+import copy
+import http.client
+import json
+import os
+import posixpath
+import shutil
+import tarfile
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from ruamel.yaml import YAML
+
+from mkdocsmerge import tree
+
+MKDOCS_YML = "mkdocs.yml"
+
+
+class RemoteError(Exception):
+    """
+    Error fetching or extracting a site bundle.
+    """
+
+
+def is_remote(site):
+    return site.startswith(("http://", "https://"))
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of persistent HTTP connections, shared by all the
+    downloads to the same host.
+    """
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+        self.idle = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def request(self, url, headers):
+        """
+        Sends a GET request and returns the connection and its response. The
+        connection must be given back with release() once the response is read.
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        with self.lock:
+            connection = self.idle[key].pop() if self.idle[key] else None
+        reused = connection is not None
+        if connection is None:
+            connection = self._connect(parts)
+
+        try:
+            connection.request("GET", path, headers=headers)
+            return key, connection, connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            if not reused:
+                raise
+        # The server may have closed an idle connection, retry with a new one
+        connection = self._connect(parts)
+        try:
+            connection.request("GET", path, headers=headers)
+            return key, connection, connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            raise
+
+    def release(self, key, connection, response):
+        if response.isclosed() and not response.will_close:
+            with self.lock:
+                self.idle[key].append(connection)
+        else:
+            connection.close()
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle.values():
+                for connection in connections:
+                    connection.close()
+            self.idle.clear()
+
+    def _connect(self, parts):
+        if parts.scheme == "https":
+            return http.client.HTTPSConnection(parts.netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(parts.netloc, timeout=self.timeout)
+
+
+def load_cache(path):
+    try:
+        with open(path) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(path, cache):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as cache_file:
+        json.dump(cache, cache_file)
+    os.replace(tmp_path, path)
+
+
+def get_site_root(site_name):
+    return site_name.replace(" ", "_").lower()
+
+
+def fetch_sites(urls, master_docs_root, cache, print_func, max_connections=4, pool=None):
+    """
+    Downloads the site bundles concurrently and extracts them into the
+    master_docs_root. Bundles not modified since they were cached are not
+    downloaded again.
+
+    Args:
+        urls: List of bundle URLs
+        master_docs_root: Path to the master site's docs directory
+        cache: Dictionary with the cached bundles (see load_cache), updated
+               with the fetched bundles
+        print_func: Function to use for printing status messages
+        max_connections: Maximum number of concurrent downloads
+
+    Returns:
+        Dictionary with a (site_data, tree.CopyResult) tuple per URL, or None
+        for the bundles that could not be fetched
+    """
+    own_pool = pool is None
+    pool = pool or ConnectionPool()
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_connections) as executor:
+            futures = {url: executor.submit(fetch_site, url, master_docs_root, cache.get(url), pool) for url in urls}
+            for url, future in futures.items():
+                try:
+                    entry, copied = future.result()
+                except (RemoteError, OSError, http.client.HTTPException) as exc:
+                    print_func('Error fetching the site bundle "' + url + '": ' + str(exc))
+                    results[url] = None
+                    continue
+                if copied.copied:
+                    print_func('Downloaded the site bundle "' + url + '"')
+                else:
+                    print_func('The site bundle "' + url + '" was not modified')
+                cache[url] = entry
+                results[url] = (copy.deepcopy(entry["site_data"]), copied)
+    finally:
+        if own_pool:
+            pool.close()
+    return results
+
+
+def fetch_site(url, master_docs_root, cached, pool):
+    """
+    Fetches a single bundle with a conditional request, and returns its new
+    cache entry and the tree.CopyResult of its extraction.
+    """
+    headers = {}
+    if cached and os.path.isdir(os.path.join(master_docs_root, cached["site_root"])):
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    key, connection, response = pool.request(url, headers)
+    try:
+        if response.status == 304 and headers:
+            response.read()
+            entry = cached
+            copied = tree.CopyResult()
+            copied.unchanged = list(cached["files"])
+        elif response.status != 200:
+            response.read()
+            raise RemoteError(f"HTTP {response.status} {response.reason}")
+        else:
+            site_data, copied = extract_bundle(response, url, master_docs_root)
+            # Read the end of the archive so the connection can be reused
+            response.read()
+            entry = {
+                "etag": response.getheader("ETag"),
+                "last_modified": response.getheader("Last-Modified"),
+                "site_root": get_site_root(site_data["site_name"]),
+                "site_data": site_data,
+                "files": copied.files,
+            }
+    except BaseException:
+        connection.close()
+        raise
+
+    pool.release(key, connection, response)
+    return entry, copied
+
+
+def extract_bundle(stream, url, master_docs_root):
+    """
+    Extracts the docs_dir of a bundle read from a stream into the master's
+    docs directory, under the site root given by the bundle's site_name.
+    Files found before mkdocs.yml are kept in memory until the site root is
+    known, so bundles should have mkdocs.yml as their first member.
+
+    Returns:
+        Tuple with the site data (site_name, docs_dir and nav) and the
+        tree.CopyResult of the extraction
+    """
+    site_data = None
+    pending = []
+    copied = tree.CopyResult()
+
+    try:
+        with tarfile.open(fileobj=stream, mode="r|*") as archive:
+            for member in archive:
+                name = posixpath.normpath(member.name.lstrip("/"))
+                if not member.isfile():
+                    continue
+                if name == MKDOCS_YML:
+                    site_data = _load_site_data(archive.extractfile(member), url)
+                    target = os.path.join(master_docs_root, get_site_root(site_data["site_name"]))
+                    for pending_name, mtime, data in pending:
+                        _write_member(site_data, target, pending_name, mtime, data, copied)
+                    pending = []
+                elif site_data is None:
+                    pending.append((name, member.mtime, archive.extractfile(member).read()))
+                else:
+                    _write_member(site_data, target, name, member.mtime, archive.extractfile(member), copied)
+    except tarfile.TarError as exc:
+        raise RemoteError("Invalid site bundle: " + str(exc))
+
+    if site_data is None:
+        raise RemoteError("The bundle does not contain a " + MKDOCS_YML + " file")
+    return site_data, copied
+
+
+def _load_site_data(yml_file, url):
+    try:
+        data = YAML(typ="safe").load(yml_file)
+    except Exception:
+        raise RemoteError("Error loading the " + MKDOCS_YML + " file of the bundle")
+    if not isinstance(data, dict) or "nav" not in data:
+        raise RemoteError('Could not find the "nav" entry in the ' + MKDOCS_YML + " file of the bundle")
+
+    site_name = data.get("site_name")
+    if site_name is None:
+        # Default to the bundle file name, like the folder name of local sites
+        site_name = posixpath.basename(urlsplit(url).path).split(".")[0]
+
+    # The site root is a single folder of the master docs_dir, a bundle must
+    # not be able to write anywhere else
+    site_root = get_site_root(str(site_name))
+    if site_root in ("", ".", "..") or "/" in site_root or "\\" in site_root or os.path.isabs(site_root):
+        raise RemoteError('Invalid "site_name" in the ' + MKDOCS_YML + " file of the bundle: " + str(site_name))
+    return {"site_name": str(site_name), "docs_dir": data.get("docs_dir", "docs"), "nav": data["nav"]}
+
+
+def _write_member(site_data, target, name, mtime, data, copied):
+    prefix = posixpath.normpath(site_data["docs_dir"]) + "/"
+    if not name.startswith(prefix):
+        return
+    rel_path = posixpath.relpath(name, prefix)
+    if rel_path.startswith("../") or "/../" in rel_path:
+        raise RemoteError("Invalid path in the bundle: " + name)
+
+    path = os.path.join(target, *rel_path.split("/"))
+    state = "modified" if os.path.exists(path) else "added"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tree.unlink_shared(path)
+    with open(path, "wb") as dst_file:
+        if isinstance(data, bytes):
+            dst_file.write(data)
+        else:
+            shutil.copyfileobj(data, dst_file)
+    os.utime(path, (mtime, mtime))
+
+    getattr(copied, state).append(rel_path)
+    copied.bytes += os.path.getsize(path)
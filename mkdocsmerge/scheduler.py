@@ -0,0 +1,201 @@
+"""
+I/O scheduler for the copy of the sites' files, to avoid saturating shared
+storage when merging.
+"""
+
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict, deque
+
+from mkdocsmerge import tree
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class RateLimiter:
+    """
+    Token bucket limiting the number of bytes per second. Consumers may go
+    into debt and then wait until the debt is paid, so large reads are
+    allowed but the average rate is respected.
+    """
+
+    def __init__(self, bytes_per_second, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(bytes_per_second)
+        self.clock = clock
+        self.sleep = sleep
+        self.allowance = self.rate
+        self.last = clock()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        with self.lock:
+            now = self.clock()
+            self.allowance = min(self.rate, self.allowance + (now - self.last) * self.rate)
+            self.last = now
+            self.allowance -= amount
+            delay = -self.allowance / self.rate if self.allowance < 0 else 0
+        if delay:
+            self.sleep(delay)
+
+
+class IOScheduler:
+    """
+    Copies files in worker threads with a limit of concurrent files and an
+    optional bandwidth cap.
+
+    Files are queued per (source device, destination device) pair and the
+    queues are served in turns, so a slow device does not starve the copies
+    to the other ones. Files smaller than small_file_size are grouped into
+    batches of up to batch_bytes that are copied by a single worker.
+
+    Use submit() for every file and wait() to block until all of them were
+    copied; wait() raises the first error found while copying.
+    """
+
+    def __init__(
+        self,
+        max_files=4,
+        bytes_per_second=None,
+        small_file_size=64 * 1024,
+        batch_bytes=1024 * 1024,
+        batch_files=64,
+    ):
+        if max_files < 1:
+            raise ValueError("max_files must be 1 or greater")
+        self.max_files = max_files
+        self.limiter = RateLimiter(bytes_per_second) if bytes_per_second else None
+        self.small_file_size = small_file_size
+        self.batch_bytes = batch_bytes
+        self.batch_files = batch_files
+
+        self.condition = threading.Condition()
+        self.callback_lock = threading.Lock()
+        self.queues = OrderedDict()
+        self.open_batches = {}
+        self.devices = {}
+        self.workers = []
+        self.running = 0
+        self.errors = []
+        self.closed = False
+
+    def submit(self, src, dst, size, callback=None):
+        """
+        Schedules the copy of src to dst. The callback, if any, is called as
+        callback(src, dst, size) once the file is copied; callbacks are never
+        called concurrently.
+        """
+        key = (self._device(os.path.dirname(src)), self._device(os.path.dirname(dst)))
+        job = (src, dst, size, callback)
+        with self.condition:
+            if size >= self.small_file_size:
+                self._enqueue(key, [job])
+            else:
+                batch = self.open_batches.setdefault(key, [[], 0])
+                batch[0].append(job)
+                batch[1] += size
+                if batch[1] >= self.batch_bytes or len(batch[0]) >= self.batch_files:
+                    del self.open_batches[key]
+                    self._enqueue(key, batch[0])
+            self._start_workers()
+
+    def wait(self):
+        """
+        Blocks until every submitted file has been copied.
+        """
+        with self.condition:
+            for key, batch in list(self.open_batches.items()):
+                self._enqueue(key, batch[0])
+            self.open_batches.clear()
+            self.condition.notify_all()
+            while self.running or any(self.queues.values()):
+                self.condition.wait()
+            errors, self.errors = self.errors, []
+        if errors:
+            raise errors[0]
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _device(self, directory):
+        device = self.devices.get(directory)
+        if device is None:
+            try:
+                device = os.stat(directory).st_dev
+            except OSError:
+                device = -1
+            self.devices[directory] = device
+        return device
+
+    def _enqueue(self, key, batch):
+        self.queues.setdefault(key, deque()).append(batch)
+        self.condition.notify()
+
+    def _start_workers(self):
+        while len(self.workers) < self.max_files:
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def _next_batch(self):
+        # Serve the device queues in turns
+        for key, queue in self.queues.items():
+            if queue:
+                batch = queue.popleft()
+                self.queues.move_to_end(key)
+                return batch
+        return None
+
+    def _work(self):
+        while True:
+            with self.condition:
+                batch = self._next_batch()
+                while batch is None:
+                    if self.closed:
+                        return
+                    self.condition.wait()
+                    batch = self._next_batch()
+                self.running += 1
+
+            try:
+                for src, dst, size, callback in batch:
+                    # Any error, also from the callback, is raised by wait()
+                    # instead of killing the worker
+                    try:
+                        self._copy(src, dst, size)
+                        if callback is not None:
+                            with self.callback_lock:
+                                callback(src, dst, size)
+                    except Exception as exc:
+                        with self.condition:
+                            self.errors.append(exc)
+            finally:
+                with self.condition:
+                    self.running -= 1
+                    self.condition.notify_all()
+
+    def _copy(self, src, dst, size):
+        if self.limiter is None:
+            tree.copy_file(src, dst, size)
+            return
+        tree.unlink_shared(dst)
+        with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+            while True:
+                chunk = src_file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.limiter.consume(len(chunk))
+                dst_file.write(chunk)
+        shutil.copystat(src, dst)
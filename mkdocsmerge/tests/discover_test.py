@@ -0,0 +1,124 @@
+"""
+Tests for the discovery of sites under directory roots and glob patterns.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from mkdocsmerge import discover
+from mkdocsmerge.merge import run_merge
+
+from .utils import generate_website
+
+
+class TestDiscoverSites(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.owd = os.getcwd()
+        os.chdir(self.tmpdir)
+        os.makedirs(os.path.join("repo", "packages", "b"))
+        os.makedirs(os.path.join("repo", "packages", "a"))
+        generate_website("repo", "master")
+        generate_website(os.path.join("repo", "packages", "b"), "site_b")
+        generate_website(
+            os.path.join("repo", "packages", "a"), "site_a", {"site_name": "A", "nav": [{"Home": "index.md"}]}
+        )
+        # Sites inside node_modules, hidden folders and the docs_dir of a
+        # site are not discovered
+        generate_website(os.path.join("repo", "packages", "a", "site_a", "docs"), "in_docs")
+        os.makedirs(os.path.join("repo", "node_modules"))
+        generate_website(os.path.join("repo", "node_modules"), "dependency")
+        os.makedirs(os.path.join("repo", ".git"))
+        generate_website(os.path.join("repo", ".git"), "hidden")
+
+    def tearDown(self):
+        os.chdir(self.owd)
+        shutil.rmtree(self.tmpdir)
+
+    def test_discover_root(self):
+        sites = discover.discover_sites(["repo"], exclude=[os.path.join("repo", "master")])
+        self.assertEqual(
+            sites,
+            [os.path.join("repo", "packages", "a", "site_a"), os.path.join("repo", "packages", "b", "site_b")],
+        )
+
+    def test_discover_glob(self):
+        sites = discover.discover_sites([os.path.join("repo", "packages", "*")])
+        self.assertEqual(
+            sites,
+            [os.path.join("repo", "packages", "a", "site_a"), os.path.join("repo", "packages", "b", "site_b")],
+        )
+
+    def test_discover_glob_prunes_matches(self):
+        site_a = os.path.join("repo", "packages", "a", "site_a")
+        site_b = os.path.join("repo", "packages", "b", "site_b")
+        master = os.path.join("repo", "master")
+        patterns = {
+            os.path.join("repo", "**"): [site_a, site_b],
+            os.path.join("repo", "*"): [site_a, site_b],
+            os.path.join("repo", "**", "site_b"): [site_b],
+            os.path.join("repo", "**", "packages", "*", "*"): [site_a, site_b],
+            os.path.join(site_a, "*"): [],
+            os.path.join("repo", "*", "dependency"): [],
+        }
+        for pattern, expected in patterns.items():
+            self.assertEqual(discover.discover_sites([pattern], exclude=[master]), expected, pattern)
+
+    def test_recursive_glob_is_scanned_in_parallel(self):
+        # Only the part of the pattern before "**" is expanded, the scan
+        # lists every directory once
+        with mock.patch("mkdocsmerge.discover.glob.glob", wraps=discover.glob.glob) as glob:
+            with mock.patch("mkdocsmerge.discover.os.scandir", wraps=os.scandir) as scandir:
+                sites = discover.discover_sites([os.path.join("re*", "**", "site_*")])
+        self.assertEqual(glob.call_args_list, [mock.call("re*")])
+        self.assertEqual(
+            sites,
+            [os.path.join("repo", "packages", "a", "site_a"), os.path.join("repo", "packages", "b", "site_b")],
+        )
+        scanned = [call.args[0] for call in scandir.call_args_list]
+        self.assertEqual(len(scanned), len(set(scanned)))
+        self.assertNotIn(os.path.abspath(os.path.join("repo", "node_modules")), scanned)
+
+    def test_cache_skips_unmodified_directories(self):
+        cache_path = os.path.join(self.tmpdir, "cache.json")
+        # Backdate the directories so their modification times are not racy
+        for dirpath, dirnames, filenames in os.walk("repo"):
+            os.utime(dirpath, ns=(10**18, 10**18))
+        first = discover.discover_sites(["repo"], discover.DiscoveryCache(cache_path))
+
+        with mock.patch("mkdocsmerge.discover.os.scandir", wraps=os.scandir) as scandir:
+            second = discover.discover_sites(["repo"], discover.DiscoveryCache(cache_path))
+        self.assertEqual(second, first)
+        self.assertEqual(scandir.call_count, 0)
+
+        # A new site modifies its parent directory, which is scanned again
+        generate_website(os.path.join("repo", "packages"), "site_c")
+        with mock.patch("mkdocsmerge.discover.os.scandir", wraps=os.scandir) as scandir:
+            third = discover.discover_sites(["repo"], discover.DiscoveryCache(cache_path))
+        self.assertIn(os.path.join("repo", "packages", "site_c"), third)
+        self.assertEqual(
+            sorted(call.args[0] for call in scandir.call_args_list),
+            [
+                os.path.abspath(os.path.join("repo", "packages")),
+                os.path.abspath(os.path.join("repo", "packages", "site_c")),
+            ],
+        )
+
+    def test_run_merge_with_discovery(self):
+        data = run_merge(os.path.join("repo", "master"), [], False, lambda x: None, discover_roots=["repo/packages"])
+        self.assertEqual(
+            data["nav"],
+            [
+                {"Home": "index.md"},
+                {"A": [{"Home": "a/index.md"}]},
+                {"site_b Website": [{"Home": "site_b_website/index.md"}]},
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
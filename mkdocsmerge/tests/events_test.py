@@ -0,0 +1,105 @@
+"""
+Tests for the structured progress events of the merge.
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mkdocsmerge.merge
+from mkdocsmerge import events
+
+from .utils import generate_website
+
+
+class TestProgressEvents(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.owd = os.getcwd()
+        os.chdir(self.tmpdir)
+
+    def tearDown(self):
+        os.chdir(self.owd)
+        shutil.rmtree(self.tmpdir)
+
+    def test_merge_emits_events(self):
+        """
+        Verifies the sequence and payload of the events emitted for merged and
+        skipped sites.
+        """
+        generate_website(self.tmpdir, "master", {"site_name": "Master", "nav": [{"Home": "index.md"}]})
+        generate_website(
+            self.tmpdir,
+            "project_a",
+            {"site_name": "Project A", "nav": [{"Home": "index.md"}, {"About": "about.md"}]},
+        )
+
+        received = []
+        mkdocsmerge.merge.run_merge(
+            "master",
+            ["project_a", "missing"],
+            False,
+            lambda x: None,
+            progress=lambda event, payload: received.append((event, payload)),
+        )
+
+        names = [event for event, _ in received]
+        self.assertEqual(
+            names,
+            [
+                events.MERGE_STARTED,
+                events.SITE_STARTED,
+                events.FILE_COPIED,
+                events.FILE_COPIED,
+                events.SITE_FINISHED,
+                events.SITE_STARTED,
+                events.SITE_SKIPPED,
+                events.MERGE_FINISHED,
+            ],
+        )
+        self.assertEqual(received[0][1], {"total_sites": 2})
+        copied = sorted(payload["path"] for event, payload in received if event == events.FILE_COPIED)
+        self.assertEqual(copied, ["about.md", "index.md"])
+
+        finished = received[4][1]
+        self.assertEqual(finished["site_name"], "Project A")
+        self.assertEqual(finished["files"], 2)
+        self.assertEqual(
+            finished["bytes"],
+            sum(payload["bytes"] for event, payload in received if event == events.FILE_COPIED),
+        )
+        self.assertEqual(received[6][1]["site"], "missing")
+
+    def test_json_lines_reporter(self):
+        stream = io.StringIO()
+        reporter = events.JsonLinesReporter(stream)
+        reporter(events.SITE_STARTED, {"site": "a", "index": 0, "total_sites": 1})
+        reporter(events.FILE_COPIED, {"site": "a", "path": "index.md", "bytes": 10})
+
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([record["event"] for record in records], [events.SITE_STARTED, events.FILE_COPIED])
+        self.assertEqual(records[1]["bytes"], 10)
+        self.assertIn("time", records[0])
+
+    def test_progress_bar_status_line(self):
+        now = [0.0]
+        bar = events.ProgressBar(io.StringIO(), clock=lambda: now[0])
+        bar(events.MERGE_STARTED, {"total_sites": 4})
+        bar(events.SITE_STARTED, {"site": "a", "index": 0, "total_sites": 4})
+        bar(events.FILE_COPIED, {"site": "a", "path": "index.md", "bytes": 2000000})
+        now[0] = 10.0
+        bar(events.SITE_FINISHED, {"site": "a", "files": 1, "bytes": 2000000})
+
+        line = bar.status_line()
+        self.assertIn("1/4 sites", line)
+        self.assertIn("1 files 2.0 MB", line)
+        self.assertIn("0.1 files/s 0.2 MB/s", line)
+        self.assertIn("ETA 00:30", line)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Tests for the fan-out merge of sites into several master sites.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from mkdocsmerge import fanout
+from mkdocsmerge import lock
+from mkdocsmerge import merge
+
+from .utils import generate_website
+
+
+class TestFanoutMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.owd = os.getcwd()
+        os.chdir(self.tmpdir)
+        generate_website(self.tmpdir, "public", {"site_name": "Public", "nav": [{"Home": "index.md"}]})
+        generate_website(
+            self.tmpdir,
+            "internal",
+            {"site_name": "Internal", "nav": [{"Home": "index.md"}, {"Project A": "old.md"}]},
+        )
+        generate_website(self.tmpdir, "project_a", {"site_name": "Project A", "nav": [{"Home": "index.md"}]})
+        generate_website(self.tmpdir, "project_a2", {"site_name": "Project A", "nav": [{"Extra": "extra.md"}]})
+
+    def tearDown(self):
+        os.chdir(self.owd)
+        shutil.rmtree(self.tmpdir)
+
+    def test_fanout_merge(self):
+        config_path = os.path.join(self.tmpdir, "fanout.yml")
+        with open(config_path, "w") as f:
+            f.write(
+                "masters:\n"
+                "  - master_site: public\n"
+                "    sites: [project_a, project_a2]\n"
+                "    unify_sites: true\n"
+                "  - master_site: internal\n"
+                "    sites: [project_a]\n"
+                "    dedup: false\n"
+            )
+        masters = fanout.load_fanout_config(config_path)
+
+        with mock.patch("mkdocsmerge.tree.os.scandir", wraps=os.scandir) as scandir:
+            result = fanout.run_fanout_merge(masters, lambda x: None)
+
+        # Each site's docs_dir is listed once, whatever the number of masters
+        self.assertEqual(
+            sorted(call.args[0] for call in scandir.call_args_list if call.args[0].startswith(self.tmpdir)),
+            [os.path.join(self.tmpdir, "project_a", "docs"), os.path.join(self.tmpdir, "project_a2", "docs")],
+        )
+        self.assertEqual(
+            result[os.path.join(self.tmpdir, "public")]["nav"],
+            [{"Home": "index.md"}, {"Project A": [{"Home": "project_a/index.md"}, {"Extra": "project_a/extra.md"}]}],
+        )
+        self.assertEqual(
+            result[os.path.join(self.tmpdir, "internal")]["nav"],
+            [
+                {"Home": "index.md"},
+                {"Project A": "old.md"},
+                {"Project A": [{"Home": "project_a/index.md"}]},
+            ],
+        )
+        self.assertTrue(os.path.isfile(os.path.join("public", "docs", "project_a", "extra.md")))
+        self.assertTrue(os.path.isfile(os.path.join("internal", "docs", "project_a", "index.md")))
+        self.assertFalse(os.path.exists(os.path.join("internal", "docs", "project_a", "extra.md")))
+
+    def test_fanout_merge_waits_for_master_lock(self):
+        masters = [
+            {"master_site": "public", "sites": ["project_a"], "unify_sites": False, "dedup": True},
+            {"master_site": "internal", "sites": ["project_a"], "unify_sites": False, "dedup": True},
+        ]
+        thread = threading.Thread(target=fanout.run_fanout_merge, args=(masters, lambda x: None))
+        # A merge into one of the master sites holds its lock
+        with lock.MasterLock(os.path.join("internal", merge.STATE_DIR, merge.LOCK_FILE)):
+            thread.start()
+            thread.join(0.5)
+            self.assertTrue(thread.is_alive())
+            self.assertFalse(os.path.exists(os.path.join("public", "docs", "project_a")))
+        thread.join()
+        self.assertTrue(os.path.isfile(os.path.join("public", "docs", "project_a", "index.md")))
+        self.assertTrue(os.path.isfile(os.path.join("internal", "docs", "project_a", "index.md")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Tests for resuming interrupted merges with the checkpoint journal.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import mkdocsmerge.merge
+from mkdocsmerge import tree
+from mkdocsmerge.journal import Journal
+from mkdocsmerge.manifest import FileList
+
+from .utils import generate_website
+
+copy_tree = tree.copy_tree
+
+
+class TestResumeMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.owd = os.getcwd()
+        os.chdir(self.tmpdir)
+        generate_website(self.tmpdir, "master", {"site_name": "Master", "nav": [{"Home": "index.md"}]})
+        generate_website(self.tmpdir, "project_a", {"site_name": "Project A", "nav": [{"Home": "index.md"}]})
+        generate_website(self.tmpdir, "project_b", {"site_name": "Project B", "nav": [{"Home": "index.md"}]})
+        self.journal_path = os.path.join("master", mkdocsmerge.merge.STATE_DIR, mkdocsmerge.merge.JOURNAL_FILE)
+
+    def tearDown(self):
+        os.chdir(self.owd)
+        shutil.rmtree(self.tmpdir)
+
+    def test_resume_interrupted_merge(self):
+        sites = ["project_a", "project_b"]
+
+        def crash_on_project_b(src, dst, **kwargs):
+            if src.startswith("project_b"):
+                raise MemoryError()
+            return copy_tree(src, dst, **kwargs)
+
+        with mock.patch("mkdocsmerge.merge.tree.copy_tree", side_effect=crash_on_project_b):
+            with self.assertRaises(MemoryError):
+                mkdocsmerge.merge.run_merge("master", sites, False, lambda x: None)
+
+        # The master nav was not written, and project_a is in the journal
+        with open(os.path.join("master", "mkdocs.yml")) as f:
+            self.assertNotIn("Project A", f.read())
+        journal = Journal(self.journal_path, sites, False)
+        self.assertTrue(journal.resume())
+        self.assertEqual(list(journal.completed), ["project_a"])
+
+        with mock.patch("mkdocsmerge.merge.tree.copy_tree", wraps=copy_tree) as copy_tree_mock:
+            result = mkdocsmerge.merge.run_merge("master", sites, False, lambda x: None, resume=True)
+        self.assertEqual([call.args[0] for call in copy_tree_mock.call_args_list], [os.path.join("project_b", "docs")])
+
+        self.assertEqual(
+            result["nav"],
+            [
+                {"Home": "index.md"},
+                {"Project A": [{"Home": "project_a/index.md"}]},
+                {"Project B": [{"Home": "project_b/index.md"}]},
+            ],
+        )
+        self.assertFalse(os.path.exists(self.journal_path))
+
+    def test_resumed_merge_manifest(self):
+        sites = ["project_a", "project_b"]
+
+        def crash_on_project_b(src, dst, **kwargs):
+            if src.startswith("project_b"):
+                raise MemoryError()
+            return copy_tree(src, dst, **kwargs)
+
+        with mock.patch("mkdocsmerge.merge.tree.copy_tree", side_effect=crash_on_project_b):
+            with self.assertRaises(MemoryError):
+                mkdocsmerge.merge.run_merge("master", sites, False, lambda x: None, manifest="manifest.json")
+        mkdocsmerge.merge.run_merge("master", sites, False, lambda x: None, resume=True, manifest="manifest.json")
+
+        # The site merged before the interruption is still reported, and its
+        # files are recorded for the next merges
+        with open("manifest.json") as f:
+            manifest = json.load(f)
+        self.assertEqual(
+            [(site["site"], site["added"]) for site in manifest["sites"]],
+            [("project_a", ["project_a/index.md"]), ("project_b", ["project_b/index.md"])],
+        )
+        file_list = FileList(os.path.join("master", mkdocsmerge.merge.STATE_DIR, mkdocsmerge.merge.FILE_LIST_FILE))
+        self.assertEqual(file_list.get("project_a"), {"site_root": "project_a", "files": ["index.md"]})
+
+    def test_journal_of_other_merge_is_ignored(self):
+        journal = Journal(self.journal_path, ["project_a"], False)
+        journal.start()
+        journal.record("project_a", "Project A", "project_a", ["project_a/stale.md"])
+
+        self.assertFalse(Journal(self.journal_path, ["project_a", "project_b"], False).resume())
+        self.assertFalse(Journal(self.journal_path, ["project_a"], True).resume())
+
+        result = mkdocsmerge.merge.run_merge("master", ["project_a", "project_b"], False, lambda x: None, resume=True)
+        self.assertEqual(result["nav"][1], {"Project A": [{"Home": "project_a/index.md"}]})
+
+    def test_truncated_journal_line(self):
+        journal = Journal(self.journal_path, ["project_a", "project_b"], False)
+        journal.start()
+        journal.record("project_a", "Project A", "project_a", [{"Home": "project_a/index.md"}])
+        with open(self.journal_path, "a") as f:
+            f.write('{"site": "project_b", "na')
+
+        journal = Journal(self.journal_path, ["project_a", "project_b"], False)
+        self.assertTrue(journal.resume())
+        self.assertEqual(list(journal.completed), ["project_a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+"""
+Tests for the master site lock and the coalescing of concurrent merges.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from mkdocsmerge import lock
+from mkdocsmerge import merge
+from mkdocsmerge import verify as nav_verify
+
+from .utils import generate_website
+
+
+class TestMasterLock(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_lock_is_exclusive(self):
+        path = os.path.join(self.tmpdir, "state", "lock")
+        with lock.MasterLock(path):
+            with self.assertRaises(lock.LockTimeout):
+                lock.MasterLock(path, timeout=0.2).acquire()
+        with lock.MasterLock(path, timeout=0.2):
+            pass
+
+    def test_request_queue(self):
+        queue = lock.RequestQueue(os.path.join(self.tmpdir, "queue"))
+        first = queue.submit(["a"], False)
+        second = queue.submit(["b"], True)
+        self.assertEqual(
+            queue.pending(),
+            [(first, {"sites": ["a"], "unify_sites": False}), (second, {"sites": ["b"], "unify_sites": True})],
+        )
+        third = queue.submit(["c"], False, manifest=True, verify=True)
+        self.assertEqual(
+            queue.pending()[-1], (third, {"sites": ["c"], "unify_sites": False, "manifest": True, "verify": True})
+        )
+        queue.complete([first])
+        self.assertFalse(queue.is_pending(first))
+        self.assertTrue(queue.is_pending(second))
+
+
+class TestCoalescedMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        generate_website(self.tmpdir, "master")
+        for name in ["project_a", "project_b", "project_c"]:
+            generate_website(self.tmpdir, name, {"site_name": name, "nav": [{"Home": "index.md"}]})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_queued_requests_are_merged_together(self):
+        master_site = os.path.join(self.tmpdir, "master")
+        state_dir = os.path.join(master_site, merge.STATE_DIR)
+        results = {}
+
+        def publish(name):
+            site = os.path.join(self.tmpdir, name)
+            results[name] = merge.run_merge(master_site, [site], False, lambda x: None, coalesce=True)
+
+        # The requests queue up while a merge holds the master site
+        with mock.patch("mkdocsmerge.merge.merge_sites", wraps=merge.merge_sites) as merge_sites:
+            with lock.MasterLock(os.path.join(state_dir, merge.LOCK_FILE)):
+                threads = [
+                    threading.Thread(target=publish, args=(name,)) for name in ["project_a", "project_b", "project_c"]
+                ]
+                for thread in threads:
+                    thread.start()
+                queue = lock.RequestQueue(os.path.join(state_dir, merge.QUEUE_DIR))
+                while len(queue.pending()) < 3:
+                    time.sleep(0.01)
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(merge_sites.call_count, 1)
+        self.assertEqual(sum(result is not None for result in results.values()), 1)
+        self.assertEqual(queue.pending(), [])
+        merged = next(result for result in results.values() if result is not None)
+        # The order of the queued requests depends on the threads
+        self.assertEqual(
+            sorted(list(page)[0] for page in merged["nav"]), ["Home", "project_a", "project_b", "project_c"]
+        )
+
+    def test_coalesced_requests_get_their_manifest(self):
+        master_site = os.path.join(self.tmpdir, "master")
+        state_dir = os.path.join(master_site, merge.STATE_DIR)
+
+        def publish(name):
+            site = os.path.join(self.tmpdir, name)
+            manifest = os.path.join(self.tmpdir, name + ".json")
+            merge.run_merge(master_site, [site], False, lambda x: None, coalesce=True, manifest=manifest)
+
+        with lock.MasterLock(os.path.join(state_dir, merge.LOCK_FILE)):
+            threads = [threading.Thread(target=publish, args=(name,)) for name in ["project_a", "project_b"]]
+            for thread in threads:
+                thread.start()
+            queue = lock.RequestQueue(os.path.join(state_dir, merge.QUEUE_DIR))
+            while len(queue.pending()) < 2:
+                time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+
+        manifests = {}
+        for name in ["project_a", "project_b"]:
+            with open(os.path.join(self.tmpdir, name + ".json")) as f:
+                manifests[name] = json.load(f)
+        # The merging invocation reports all the sites, the other one its own
+        counts = sorted(len(manifest["sites"]) for manifest in manifests.values())
+        self.assertEqual(counts, [1, 2])
+        follower = next(name for name, manifest in manifests.items() if len(manifest["sites"]) == 1)
+        self.assertEqual(manifests[follower]["sites"][0]["added"], [follower + "/index.md"])
+        self.assertEqual(
+            manifests[follower]["nav"]["added"], [{"titles": [follower, "Home"], "path": follower + "/index.md"}]
+        )
+        self.assertEqual(os.listdir(os.path.join(state_dir, merge.QUEUE_DIR)), [])
+
+    def test_missing_manifest_of_coalesced_request(self):
+        master_site = os.path.join(self.tmpdir, "master")
+        queue = lock.RequestQueue(os.path.join(master_site, merge.STATE_DIR, merge.QUEUE_DIR))
+        # The request is merged by another invocation without saving its manifest
+        with mock.patch.object(lock.RequestQueue, "is_pending", return_value=False):
+            with self.assertRaises(lock.MissingResult):
+                merge.run_merge(
+                    master_site,
+                    [os.path.join(self.tmpdir, "project_a")],
+                    False,
+                    lambda x: None,
+                    coalesce=True,
+                    manifest=os.path.join(self.tmpdir, "manifest.json"),
+                )
+        # The failed invocation withdraws its request
+        self.assertEqual(queue.pending(), [])
+
+    def test_lock_timeout_withdraws_request(self):
+        master_site = os.path.join(self.tmpdir, "master")
+        state_dir = os.path.join(master_site, merge.STATE_DIR)
+        with lock.MasterLock(os.path.join(state_dir, merge.LOCK_FILE)):
+            with self.assertRaises(lock.LockTimeout):
+                merge.run_merge(
+                    master_site,
+                    [os.path.join(self.tmpdir, "project_a")],
+                    False,
+                    lambda x: None,
+                    coalesce=True,
+                    lock_timeout=0.2,
+                )
+        queue = lock.RequestQueue(os.path.join(state_dir, merge.QUEUE_DIR))
+        self.assertEqual(queue.pending(), [])
+
+        # A later merge does not pick up the sites of the failed invocation
+        master_data = merge.run_merge(
+            master_site, [os.path.join(self.tmpdir, "project_b")], False, lambda x: None, coalesce=True
+        )
+        self.assertEqual([list(page)[0] for page in master_data["nav"]], ["Home", "project_b"])
+        self.assertFalse(os.path.exists(os.path.join(master_site, "docs", "project_a")))
+
+    def test_coalesced_requests_get_their_verification(self):
+        master_site = os.path.join(self.tmpdir, "master")
+        state_dir = os.path.join(master_site, merge.STATE_DIR)
+        generate_website(self.tmpdir, "project_d", {"site_name": "project_d", "nav": [{"Home": "missing.md"}]})
+        os.remove(os.path.join(self.tmpdir, "project_d", "docs", "missing.md"))
+        messages = {"project_a": [], "project_d": []}
+        errors = {}
+
+        def publish(name, verify):
+            site = os.path.join(self.tmpdir, name)
+            try:
+                merge.run_merge(master_site, [site], False, messages[name].append, coalesce=True, verify=verify)
+            except nav_verify.VerificationFailed as e:
+                errors[name] = e
+
+        # Whichever invocation merges both requests, the one asking for the
+        # verification gets the outcome for its site
+        with lock.MasterLock(os.path.join(state_dir, merge.LOCK_FILE)):
+            threads = [
+                threading.Thread(target=publish, args=("project_a", False)),
+                threading.Thread(target=publish, args=("project_d", True)),
+            ]
+            for thread in threads:
+                thread.start()
+            queue = lock.RequestQueue(os.path.join(state_dir, merge.QUEUE_DIR))
+            while len(queue.pending()) < 2:
+                time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(list(errors), ["project_d"])
+        self.assertIn(
+            'Site "project_d": nav entry points to a missing page: project_d/missing.md', messages["project_d"]
+        )
+        self.assertEqual(os.listdir(os.path.join(state_dir, merge.QUEUE_DIR)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
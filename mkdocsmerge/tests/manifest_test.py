@@ -0,0 +1,77 @@
+"""
+Tests for the manifest of the pages changed by a merge.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from mkdocsmerge.merge import run_merge
+
+from .utils import generate_website
+
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        generate_website(self.tmpdir, "master")
+        generate_website(
+            self.tmpdir,
+            "project_a",
+            {"site_name": "Project A", "nav": [{"Home": "index.md"}, {"Old": "old.md"}, {"Guide": "guide.md"}]},
+        )
+        self.master = os.path.join(self.tmpdir, "master")
+        self.site_docs = os.path.join(self.tmpdir, "project_a", "docs")
+        self.manifest = os.path.join(self.tmpdir, "manifest.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def merge(self):
+        run_merge(self.master, [os.path.join(self.tmpdir, "project_a")], False, lambda x: None, manifest=self.manifest)
+        with open(self.manifest) as f:
+            return json.load(f)
+
+    def test_manifest(self):
+        # Backdate the sources so they are not racily modified
+        for name in os.listdir(self.site_docs):
+            os.utime(os.path.join(self.site_docs, name), ns=(10**18, 10**18))
+
+        first = self.merge()
+        self.assertEqual(len(first["sites"]), 1)
+        self.assertEqual(first["sites"][0]["added"], ["project_a/guide.md", "project_a/index.md", "project_a/old.md"])
+        self.assertEqual(first["sites"][0]["removed"], [])
+        self.assertIn({"titles": ["Project A", "Guide"], "path": "project_a/guide.md"}, first["nav"]["added"])
+        self.assertEqual(first["nav"]["removed"], [])
+
+        # Modify a page, remove another one and its nav entry
+        with open(os.path.join(self.site_docs, "guide.md"), "a") as f:
+            f.write("More contents\n")
+        os.remove(os.path.join(self.site_docs, "old.md"))
+        generate_website(
+            self.tmpdir, "project_a2", {"site_name": "Project A", "nav": [{"Home": "index.md"}, {"Guide": "guide.md"}]}
+        )
+        shutil.copy(
+            os.path.join(self.tmpdir, "project_a2", "mkdocs.yml"), os.path.join(self.tmpdir, "project_a", "mkdocs.yml")
+        )
+        time.sleep(0.01)
+
+        second = self.merge()
+        site = second["sites"][0]
+        self.assertEqual(site["added"], [])
+        self.assertEqual(site["modified"], ["project_a/guide.md"])
+        self.assertEqual(site["removed"], ["project_a/old.md"])
+        # The removed files are deleted from the master docs_dir
+        self.assertFalse(os.path.exists(os.path.join(self.master, "docs", "project_a", "old.md")))
+        self.assertTrue(os.path.isfile(os.path.join(self.master, "docs", "project_a", "guide.md")))
+        self.assertEqual(
+            second["nav"], {"added": [], "removed": [{"titles": ["Project A", "Old"], "path": "project_a/old.md"}]}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+Tests for the output-directory mode, leaving the master site untouched.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from ruamel.yaml import YAML
+
+from mkdocsmerge import mirror
+from mkdocsmerge.merge import run_merge
+
+from .utils import generate_website
+
+
+def snapshot(directory):
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, directory)] = (os.stat(path).st_mtime_ns, f.read())
+    return files
+
+
+class TestOutputMode(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        generate_website(self.tmpdir, "master", {"site_name": "Master", "nav": [{"Home": "index.md"}]})
+        generate_website(self.tmpdir, "project_a", {"site_name": "Project A", "nav": [{"Home": "index.md"}]})
+        self.master = os.path.join(self.tmpdir, "master")
+        self.output = os.path.join(self.tmpdir, "output")
+        self.sites = [os.path.join(self.tmpdir, "project_a")]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_output_mode(self):
+        before = snapshot(self.master)
+        run_merge(self.master, self.sites, False, lambda x: None, output=self.output)
+
+        # The master site is left untouched
+        self.assertEqual(snapshot(self.master), before)
+        self.assertFalse(os.path.exists(os.path.join(self.master, "docs", "project_a")))
+
+        master_page = os.path.join(self.master, "docs", "index.md")
+        output_page = os.path.join(self.output, "docs", "index.md")
+        self.assertTrue(os.path.samefile(master_page, output_page))
+        self.assertTrue(os.path.isfile(os.path.join(self.output, "docs", "project_a", "index.md")))
+        with open(os.path.join(self.output, "mkdocs.yml")) as f:
+            self.assertEqual(
+                YAML(typ="safe").load(f)["nav"],
+                [{"Home": "index.md"}, {"Project A": [{"Home": "project_a/index.md"}]}],
+            )
+
+        # A repeated merge only changes the delta
+        os.remove(os.path.join(self.master, "docs", "index.md"))
+        with open(os.path.join(self.master, "docs", "about.md"), "w") as f:
+            f.write("About\n")
+        output_before = snapshot(self.output)
+        run_merge(self.master, self.sites, False, lambda x: None, output=self.output)
+        output_after = snapshot(self.output)
+
+        changed = {
+            path
+            for path in set(output_before) | set(output_after)
+            if output_before.get(path) != output_after.get(path)
+        }
+        self.assertEqual(
+            {path for path in changed if not path.startswith(".mkdocs-merge")},
+            {os.path.join("docs", "index.md"), os.path.join("docs", "about.md")},
+        )
+
+    def test_writes_do_not_go_through_links(self):
+        # A master page at the path of a merged page is replaced, not written
+        os.makedirs(os.path.join(self.master, "docs", "project_a"))
+        master_page = os.path.join(self.master, "docs", "project_a", "index.md")
+        with open(master_page, "w") as f:
+            f.write("Master contents\n")
+
+        for link in mirror.LINK_MODES:
+            run_merge(self.master, self.sites, False, lambda x: None, output=self.output, link=link, fast_yaml=True)
+            with open(master_page) as f:
+                self.assertEqual(f.read(), "Master contents\n")
+            with open(os.path.join(self.master, "mkdocs.yml")) as f:
+                self.assertNotIn("Project A", f.read())
+            self.assertFalse(os.path.islink(os.path.join(self.output, "docs", "project_a", "index.md")))
+            shutil.rmtree(self.output)
+
+    def test_sites_not_merged_anymore_are_removed(self):
+        generate_website(self.tmpdir, "project_b", {"site_name": "Project B", "nav": [{"Home": "index.md"}]})
+        os.makedirs(os.path.join(self.master, "docs", "project_b"))
+        with open(os.path.join(self.master, "docs", "project_b", "master.md"), "w") as f:
+            f.write("Master page\n")
+        manifest = os.path.join(self.tmpdir, "manifest.json")
+        sites = self.sites + [os.path.join(self.tmpdir, "project_b")]
+
+        def merge(sites):
+            run_merge(self.master, sites, False, lambda x: None, output=self.output, manifest=manifest)
+            with open(manifest) as f:
+                return json.load(f)
+
+        merge(sites)
+        self.assertTrue(os.path.isfile(os.path.join(self.output, "docs", "project_b", "index.md")))
+
+        # The nav changes are relative to the previous output
+        self.assertEqual(merge(sites)["nav"], {"added": [], "removed": []})
+
+        changes = merge(self.sites)
+        self.assertEqual(
+            changes["nav"], {"added": [], "removed": [{"titles": ["Project B", "Home"], "path": "project_b/index.md"}]}
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.output, "docs", "project_b", "index.md")))
+        # The master files under the same folder are still linked
+        self.assertTrue(os.path.isfile(os.path.join(self.output, "docs", "project_b", "master.md")))
+        self.assertTrue(os.path.isfile(os.path.join(self.output, "docs", "project_a", "index.md")))
+
+        shutil.rmtree(os.path.join(self.master, "docs", "project_b"))
+        merge(self.sites)
+        self.assertFalse(os.path.exists(os.path.join(self.output, "docs", "project_b")))
+
+    def test_symlink_mode(self):
+        result = mirror.mirror_site(self.master, self.output, exclude={"mkdocs.yml"}, link="symlink")
+        self.assertEqual(result.added, ["docs/index.md"])
+        self.assertTrue(os.path.islink(os.path.join(self.output, "docs", "index.md")))
+        result = mirror.mirror_site(self.master, self.output, exclude={"mkdocs.yml"}, link="symlink")
+        self.assertEqual((result.added, result.unchanged), ([], ["docs/index.md"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Tests for the fast read and write of the master site nav.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ruamel.yaml import YAML
+
+from mkdocsmerge import navyaml
+from mkdocsmerge.merge import run_merge
+
+from .utils import generate_website
+
+MASTER_YML = """# Master site
+site_name: Master  # keep this comment
+theme:
+  name: material
+nav:
+  - Home: index.md
+  - Guide:
+      - Setup: "guide/setup: first.md"
+      - 01-intro.md
+  # comment after the nav
+markdown_extensions:
+  - toc:
+      permalink: true
+"""
+
+
+class TestNavYaml(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_parse_matches_yaml_loader(self):
+        navs = [
+            "nav:\n- Home: index.md\n- Section:\n  - 'It''s': a.md\n  - 2023/post.md\n",
+            "nav:\n  - Version: 1.0\n  - yes\n",
+            "nav: [index.md]\n",
+            "nav:\n  - Home: index.md  # comment\n",
+            "nav:\n  - - x/y.md\n  - A:\n    - - z.md\n",
+            "nav:\n  - -x/y.md\n",
+        ]
+        for text in navs:
+            lines = text.splitlines(keepends=True)
+            expected = YAML(typ="safe").load(text)["nav"]
+            self.assertEqual(navyaml.NavDocument(self.write("mkdocs.yml", text)).load_nav(), expected, text)
+            try:
+                self.assertEqual(navyaml.parse_nav(lines), expected, text)
+            except navyaml._Unsupported:
+                pass
+
+    def test_dump_round_trips(self):
+        nav = [
+            {"Home": "index.md"},
+            {"Guide": [{"Setup: first": "guide/setup.md"}, "01-intro.md", {"True": "yes.md"}]},
+            {"Numbers": [{"1.0": "1e3"}, {"Empty": []}]},
+            "\u00e9t\u00e9.md",
+        ]
+        self.assertEqual(YAML(typ="safe").load(navyaml.dump_nav(nav))["nav"], nav)
+
+    def test_dump_quotes_indicators(self):
+        navs = [
+            [{"A": "- foo/bar"}],
+            ["- x/y.md"],
+            [{"- A": "a.md"}],
+            [["x/y.md"]],
+            [{"A": "-foo/bar.md"}, "? a/b", ": a/b"],
+            [{"YV \x85d8fN": "a\u2028b.md"}, "c\u2029d.md", {"E\x7f": "f\x9f.md"}],
+        ]
+        for nav in navs:
+            text = navyaml.dump_nav(nav)
+            self.assertEqual(YAML(typ="safe").load(text)["nav"], nav, text)
+            self.assertEqual(navyaml.NavDocument(self.write("mkdocs.yml", text)).load_nav(), nav, text)
+
+    def test_save_keeps_text_outside_nav(self):
+        path = self.write("mkdocs.yml", MASTER_YML)
+        config = navyaml.MasterConfig(path)
+        self.assertEqual(config.data["site_name"], "Master")
+        self.assertEqual(config.data["nav"][1]["Guide"][0], {"Setup": "guide/setup: first.md"})
+
+        config.data["nav"].append({"Project A": [{"Home": "project_a/index.md"}]})
+        config.save()
+
+        with open(path) as f:
+            text = f.read()
+        self.assertTrue(text.startswith(MASTER_YML.split("nav:")[0]))
+        self.assertTrue(
+            text.endswith("  # comment after the nav\nmarkdown_extensions:\n  - toc:\n      permalink: true\n")
+        )
+        self.assertIn("  - Project A:\n      - Home: project_a/index.md\n", text)
+        self.assertEqual(YAML(typ="safe").load(text)["nav"], config.data["nav"])
+
+    def test_nav_in_inherited_file(self):
+        base = self.write("base.yml", "theme: material\nnav:\n  - Home: index.md\n")
+        path = self.write("mkdocs.yml", "INHERIT: base.yml\nsite_name: Master\n")
+
+        config = navyaml.MasterConfig(path)
+        config.data["nav"].append({"Other": "other.md"})
+        config.save()
+
+        with open(path) as f:
+            self.assertEqual(f.read(), "INHERIT: base.yml\nsite_name: Master\n")
+        with open(base) as f:
+            self.assertEqual(f.read(), "theme: material\nnav:\n  - Home: index.md\n  - Other: other.md\n")
+
+    def test_run_merge_with_fast_yaml(self):
+        generate_website(self.tmpdir, "master")
+        generate_website(self.tmpdir, "project_a", {"site_name": "Project A", "nav": [{"Home": "index.md"}]})
+        master_yml = os.path.join(self.tmpdir, "master", "mkdocs.yml")
+        with open(master_yml, "a") as f:
+            f.write("# footer comment\n")
+
+        sites = [os.path.join(self.tmpdir, "project_a")]
+        run_merge(os.path.join(self.tmpdir, "master"), sites, False, lambda x: None, fast_yaml=True)
+        run_merge(os.path.join(self.tmpdir, "master"), sites, False, lambda x: None, fast_yaml=True)
+
+        with open(master_yml) as f:
+            text = f.read()
+        self.assertTrue(text.endswith("# footer comment\n"))
+        self.assertEqual(
+            YAML(typ="safe").load(text)["nav"],
+            [{"Home": "index.md"}, {"Project A": [{"Home": "project_a/index.md"}]}],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Tests for the MkDocs plugin merging sites at build time.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mkdocs.commands.build import build
+from mkdocs.config import load_config
+from mkdocs.structure.files import get_files
+
+from mkdocsmerge.plugin import MergePlugin
+
+from .utils import generate_website
+
+
+class TestMergePlugin(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        generate_website(self.tmpdir, "master", {"site_name": "Master", "nav": [{"Home": "index.md"}]})
+        generate_website(
+            self.tmpdir,
+            "project_a",
+            {"site_name": "Project A", "nav": [{"Home": "index.md"}, {"Guide": [{"Setup": "guide/setup.md"}]}]},
+        )
+        generate_website(self.tmpdir, "project_b", {"site_name": "Project B", "nav": [{"Home": "index.md"}]})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def load_config(self):
+        config_file = os.path.join(self.tmpdir, "master", "mkdocs.yml")
+        config = load_config(config_file=config_file, site_dir=os.path.join(self.tmpdir, "site"))
+        plugin = MergePlugin()
+        errors, warnings = plugin.load_config({"sites": ["../project_a", "../project_b"]}, config_file)
+        self.assertEqual(errors, [])
+        config.plugins["mkdocs-merge"] = plugin
+        return config
+
+    def test_build_merges_sites_without_copying(self):
+        config = self.load_config()
+        build(config)
+
+        self.assertEqual(
+            config["nav"],
+            [
+                {"Home": "index.md"},
+                {"Project A": [{"Home": "project_a/index.md"}, {"Guide": [{"Setup": "project_a/guide/setup.md"}]}]},
+                {"Project B": [{"Home": "project_b/index.md"}]},
+            ],
+        )
+        site_dir = os.path.join(self.tmpdir, "site")
+        for page in ["index.html", "project_a/index.html", "project_a/guide/setup/index.html", "project_b/index.html"]:
+            self.assertTrue(os.path.isfile(os.path.join(site_dir, page)), page)
+
+        # The master site is left untouched
+        self.assertEqual(os.listdir(os.path.join(self.tmpdir, "master", "docs")), ["index.md"])
+        with open(os.path.join(self.tmpdir, "master", "mkdocs.yml")) as f:
+            self.assertNotIn("Project A", f.read())
+
+    def test_files_point_to_original_location(self):
+        config = self.load_config()
+        config = config.plugins.on_config(config)
+        files = config.plugins.on_files(get_files(config), config=config)
+
+        page = files.get_file_from_path("project_a/guide/setup.md")
+        self.assertEqual(page.abs_src_path, os.path.join(self.tmpdir, "project_a", "docs", "guide", "setup.md"))
+
+
+if __name__ == "__main__":
+    unittest.main()
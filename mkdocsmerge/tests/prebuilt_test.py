@@ -0,0 +1,149 @@
+"""
+Tests for the post-build merge of built sites and their search indexes.
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from mkdocs.commands.build import build
+from mkdocs.config import load_config
+from mkdocs.exceptions import Abort
+
+from mkdocsmerge import lock
+from mkdocsmerge import merge
+from mkdocsmerge import prebuilt
+
+from .utils import generate_website
+
+
+def build_site(site):
+    build(load_config(config_file=os.path.join(site, "mkdocs.yml")))
+
+
+def load_search_index(site):
+    with open(os.path.join(site, "site", "search", "search_index.json")) as f:
+        return json.load(f)
+
+
+class TestPrebuiltMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.master = os.path.join(self.tmpdir, "master")
+        generate_website(self.tmpdir, "master", {"site_name": "Master", "nav": [{"Home": "index.md"}]})
+        generate_website(
+            self.tmpdir,
+            "project_a",
+            {"site_name": "Project A", "nav": [{"Home": "index.md"}, {"Guide": [{"Setup": "guide/setup.md"}]}]},
+        )
+        generate_website(
+            self.tmpdir,
+            "project_b",
+            {"site_name": "Project B", "use_directory_urls": False, "nav": [{"Home": "index.md"}]},
+        )
+        for name in ["project_a", "project_b"]:
+            build_site(os.path.join(self.tmpdir, name))
+        self.sites = [os.path.join(self.tmpdir, "project_a"), os.path.join(self.tmpdir, "project_b")]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_prebuilt_merge(self):
+        master_yaml = os.path.join(self.master, "mkdocs.yml")
+        with open(master_yaml) as f:
+            master_text = f.read()
+        data = prebuilt.run_prebuilt_merge(self.master, self.sites, False, lambda x: None)
+
+        self.assertEqual(
+            data["nav"],
+            [
+                {"Home": "index.md"},
+                {"Project A": [{"Home": "project_a/"}, {"Guide": [{"Setup": "project_a/guide/setup/"}]}]},
+                {"Project B": [{"Home": "project_b/index.html"}]},
+            ],
+        )
+        for page in ["index.html", "project_a/index.html", "project_a/guide/setup/index.html", "project_b/index.html"]:
+            self.assertTrue(os.path.isfile(os.path.join(self.master, "site", page)), page)
+        # The master pages link to the merged sites, its mkdocs.yml is untouched
+        with open(os.path.join(self.master, "site", "index.html")) as f:
+            html = f.read()
+        self.assertIn('href="project_a/guide/setup/"', html)
+        self.assertIn('href="project_b/index.html"', html)
+        with open(master_yaml) as f:
+            self.assertEqual(f.read(), master_text)
+
+        merged_index = load_search_index(self.master)
+        locations = [doc["location"] for doc in merged_index["docs"]]
+        self.assertIn("", locations)
+        self.assertIn("project_a/guide/setup/", locations)
+        self.assertIn("project_b/index.html", locations)
+
+        # Merging again gives the same site, without the sites not merged
+        prebuilt.run_prebuilt_merge(self.master, self.sites, False, lambda x: None)
+        self.assertEqual(load_search_index(self.master), merged_index)
+        prebuilt.run_prebuilt_merge(self.master, self.sites[:1], False, lambda x: None)
+        self.assertFalse(os.path.exists(os.path.join(self.master, "site", "project_b")))
+        locations = [doc["location"] for doc in load_search_index(self.master)["docs"]]
+        self.assertFalse(any(location.startswith("project_b/") for location in locations))
+        self.assertIn("project_a/guide/setup/", locations)
+
+    def test_strict_master_site(self):
+        master_yaml = os.path.join(self.master, "mkdocs.yml")
+        with open(master_yaml, "a") as f:
+            f.write("strict: true\n")
+        prebuilt.run_prebuilt_merge(self.master, self.sites, False, lambda x: None)
+        self.assertTrue(os.path.isfile(os.path.join(self.master, "site", "project_a", "index.html")))
+
+        # Other warnings still fail the build
+        with open(master_yaml, "w") as f:
+            f.write("site_name: Master\nstrict: true\nnav:\n  - Home: index.md\n  - Missing: missing.md\n")
+        with self.assertRaises(Abort):
+            prebuilt.run_prebuilt_merge(self.master, self.sites, False, lambda x: None)
+
+    def test_prebuilt_merge_waits_for_master_lock(self):
+        thread = threading.Thread(
+            target=prebuilt.run_prebuilt_merge, args=(self.master, self.sites, False, lambda x: None)
+        )
+        with lock.MasterLock(os.path.join(self.master, merge.STATE_DIR, merge.LOCK_FILE)):
+            thread.start()
+            thread.join(0.5)
+            self.assertTrue(thread.is_alive())
+            self.assertFalse(os.path.exists(os.path.join(self.master, "site")))
+        thread.join()
+        self.assertTrue(os.path.isfile(os.path.join(self.master, "site", "project_a", "index.html")))
+
+    def test_prebuilt_search_index(self):
+        with open(os.path.join(self.master, "mkdocs.yml"), "a") as f:
+            f.write("plugins:\n  - search:\n      prebuild_index: true\n")
+        prebuilt.run_prebuilt_merge(self.master, self.sites, False, lambda x: None)
+
+        # The lunr index prebuilt with the master docs only is left out
+        with open(os.path.join(self.master, ".mkdocs-merge", prebuilt.BUILD_DIR, prebuilt.SEARCH_INDEX)) as f:
+            self.assertIn("index", json.load(f))
+        merged_index = load_search_index(self.master)
+        self.assertNotIn("index", merged_index)
+        self.assertIn("config", merged_index)
+        self.assertIn("project_a/guide/setup/", [doc["location"] for doc in merged_index["docs"]])
+
+    def test_iter_search_index_in_small_chunks(self):
+        index = {
+            "config": {"lang": ["en"], "separator": "[\\s\\-]+"},
+            "docs": [
+                {"location": "", "title": "é", "text": "x" * 50},
+                {"location": "a/", "title": "A", "text": "", "rank": 12345},
+            ],
+        }
+        text = json.dumps(index, indent=2)
+        with mock.patch.object(prebuilt, "CHUNK_SIZE", 7):
+            members = list(prebuilt.iter_search_index(io.StringIO(text)))
+        self.assertEqual(members, [("config", index["config"])] + [("docs", doc) for doc in index["docs"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
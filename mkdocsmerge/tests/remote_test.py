@@ -0,0 +1,152 @@
+"""
+Tests for merging sites published as bundles on an HTTP server.
+"""
+
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import mkdocsmerge.merge
+
+from .utils import generate_website
+
+
+def make_bundle(files):
+    """
+    Creates a gzipped tar bundle from a list of (name, content) tuples.
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, content in files:
+            data = content.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = 1700000000
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class BundleHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get("If-None-Match")))
+        server.connections.add(self.client_address)
+        if self.path not in server.bundles:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        etag, body = server.bundles[self.path]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRemoteSites(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.owd = os.getcwd()
+        os.chdir(self.tmpdir)
+        generate_website(self.tmpdir, "master", {"site_name": "Master", "nav": [{"Home": "index.md"}]})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), BundleHandler)
+        self.server.bundles = {}
+        self.server.requests = []
+        self.server.connections = set()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = "http://127.0.0.1:%d" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.chdir(self.owd)
+        shutil.rmtree(self.tmpdir)
+
+    def publish(self, name, etag, site_name, pages):
+        yml = "site_name: %s\nnav:\n" % site_name + "".join("  - %s: %s\n" % (page, page) for page in pages)
+        files = [("mkdocs.yml", yml)] + [("docs/" + page, "# " + page) for page in pages]
+        self.server.bundles["/" + name] = (etag, make_bundle(files))
+        return self.base_url + "/" + name
+
+    def test_merge_bundles_with_conditional_requests(self):
+        url_a = self.publish("a.tar.gz", '"a1"', "Project A", ["index.md", "guide/setup.md"])
+        url_b = self.publish("b.tar.gz", '"b1"', "Project B", ["index.md"])
+
+        result = mkdocsmerge.merge.run_merge("master", [url_a, url_b], False, lambda x: None)
+        expected_nav = [
+            {"Home": "index.md"},
+            {"Project A": [{"index.md": "project_a/index.md"}, {"guide/setup.md": "project_a/guide/setup.md"}]},
+            {"Project B": [{"index.md": "project_b/index.md"}]},
+        ]
+        self.assertEqual(result["nav"], expected_nav)
+        with open(os.path.join("master", "docs", "project_a", "guide", "setup.md")) as f:
+            self.assertEqual(f.read(), "# guide/setup.md")
+
+        # Unchanged bundles only cost a 304 response
+        self.server.requests.clear()
+        result = mkdocsmerge.merge.run_merge("master", [url_a, url_b], False, lambda x: None)
+        self.assertEqual(result["nav"], expected_nav)
+        self.assertEqual(sorted(self.server.requests), [("/a.tar.gz", '"a1"'), ("/b.tar.gz", '"b1"')])
+
+        # Only the modified bundle is downloaded
+        self.publish("b.tar.gz", '"b2"', "Project B", ["index.md", "news.md"])
+        messages = []
+        result = mkdocsmerge.merge.run_merge("master", [url_a, url_b], False, messages.append)
+        self.assertEqual(
+            result["nav"][2], {"Project B": [{"index.md": "project_b/index.md"}, {"news.md": "project_b/news.md"}]}
+        )
+        self.assertIn('The site bundle "' + url_a + '" was not modified', messages)
+        self.assertIn('Downloaded the site bundle "' + url_b + '"', messages)
+
+    def test_connections_are_reused(self):
+        urls = [self.publish("%d.tar" % i, '"%d"' % i, "Site %d" % i, ["index.md"]) for i in range(6)]
+        mkdocsmerge.merge.run_merge("master", urls, False, lambda x: None, max_downloads=2)
+        self.assertEqual(len(self.server.requests), 6)
+        self.assertLessEqual(len(self.server.connections), 2)
+
+    def test_missing_bundle_is_skipped(self):
+        url = self.base_url + "/missing.tar.gz"
+        messages = []
+        result = mkdocsmerge.merge.run_merge("master", [url], False, messages.append)
+        self.assertEqual(result["nav"], [{"Home": "index.md"}])
+        self.assertIn('Error fetching the site bundle "' + url + '": HTTP 404 Not Found', messages)
+
+    def test_bundle_site_name_cannot_leave_docs_dir(self):
+        urls = [
+            self.publish("up.tar", '"1"', "../../outside", ["index.md"]),
+            self.publish("nested.tar", '"1"', "a/b", ["index.md"]),
+        ]
+        messages = []
+        result = mkdocsmerge.merge.run_merge("master", urls, False, messages.append)
+        self.assertEqual(result["nav"], [{"Home": "index.md"}])
+        self.assertIn(
+            'Error fetching the site bundle "' + urls[0] + '": Invalid "site_name" in the mkdocs.yml file of the '
+            "bundle: ../../outside",
+            messages,
+        )
+        self.assertFalse(os.path.exists("outside"))
+        self.assertFalse(os.path.exists(os.path.join("master", "docs", "a")))
+
+
+if __name__ == "__main__":
+    unittest.main()
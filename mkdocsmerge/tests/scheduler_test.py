@@ -0,0 +1,153 @@
+"""
+Tests for the I/O scheduler used to copy the sites' files.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import mkdocsmerge.merge
+from mkdocsmerge import scheduler
+
+from .utils import generate_website
+
+
+class TestIOScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.src = os.path.join(self.tmpdir, "src")
+        self.dst = os.path.join(self.tmpdir, "dst")
+        os.mkdir(self.src)
+        os.mkdir(self.dst)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_file(self, name, size):
+        path = os.path.join(self.src, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        return path
+
+    def test_copies_small_and_large_files(self):
+        names = ["small%d.md" % i for i in range(10)] + ["large.png"]
+        done = []
+        with scheduler.IOScheduler(max_files=3, small_file_size=100, batch_files=4) as io_scheduler:
+            for name in names:
+                size = 1000 if name == "large.png" else 10
+                src = self.make_file(name, size)
+                io_scheduler.submit(src, os.path.join(self.dst, name), size, callback=lambda *job: done.append(job))
+            io_scheduler.wait()
+
+        self.assertEqual(sorted(os.listdir(self.dst)), sorted(names))
+        self.assertEqual(sorted(os.path.basename(src) for src, _, _ in done), sorted(names))
+        self.assertEqual(os.path.getsize(os.path.join(self.dst, "large.png")), 1000)
+
+    def test_wait_raises_copy_errors(self):
+        with scheduler.IOScheduler(max_files=2) as io_scheduler:
+            io_scheduler.submit(os.path.join(self.src, "missing.md"), os.path.join(self.dst, "missing.md"), 10)
+            with self.assertRaises(OSError):
+                io_scheduler.wait()
+            # The scheduler can still be used after an error
+            src = self.make_file("index.md", 10)
+            io_scheduler.submit(src, os.path.join(self.dst, "index.md"), 10)
+            io_scheduler.wait()
+        self.assertTrue(os.path.isfile(os.path.join(self.dst, "index.md")))
+
+    def test_wait_raises_callback_errors(self):
+        def callback(src, dst, size):
+            if src.endswith("broken.md"):
+                raise BrokenPipeError()
+            if src.endswith("invalid.md"):
+                raise ValueError()
+
+        with scheduler.IOScheduler(max_files=1, small_file_size=100) as io_scheduler:
+            for name in ["broken.md", "invalid.md", "index.md"]:
+                src = self.make_file(name, 10)
+                io_scheduler.submit(src, os.path.join(self.dst, name), 10, callback=callback)
+            with self.assertRaises(BrokenPipeError):
+                io_scheduler.wait()
+            # The worker survived the errors and copied the rest of the batch
+            src = self.make_file("next.md", 10)
+            io_scheduler.submit(src, os.path.join(self.dst, "next.md"), 10, callback=callback)
+            io_scheduler.wait()
+        self.assertEqual(sorted(os.listdir(self.dst)), ["broken.md", "index.md", "invalid.md", "next.md"])
+
+    def test_bandwidth_limit(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        limiter = scheduler.RateLimiter(100, clock=lambda: now[0], sleep=sleep)
+        limiter.consume(100)
+        self.assertEqual(sleeps, [])
+        limiter.consume(250)
+        self.assertEqual(sleeps, [2.5])
+        now[0] += 1
+        limiter.consume(50)
+        self.assertEqual(sleeps, [2.5])
+
+    def test_run_merge_with_scheduler(self):
+        owd = os.getcwd()
+        os.chdir(self.tmpdir)
+        try:
+            generate_website(self.tmpdir, "master", {"site_name": "Master", "nav": [{"Home": "index.md"}]})
+            generate_website(
+                self.tmpdir,
+                "project_a",
+                {"site_name": "Project A", "nav": [{"Home": "index.md"}, {"About": "about.md"}]},
+            )
+            with scheduler.IOScheduler(max_files=2, bytes_per_second=10**9) as io_scheduler:
+                mkdocsmerge.merge.run_merge("master", ["project_a"], False, lambda x: None, scheduler=io_scheduler)
+        finally:
+            os.chdir(owd)
+
+        for name in ["index.md", "about.md"]:
+            self.assertTrue(os.path.isfile(os.path.join(self.tmpdir, "master", "docs", "project_a", name)))
+
+    def test_failed_copy_with_tree_index(self):
+        owd = os.getcwd()
+        os.chdir(self.tmpdir)
+        try:
+            generate_website(self.tmpdir, "master", {"site_name": "Master", "nav": [{"Home": "index.md"}]})
+            generate_website(
+                self.tmpdir, "a", {"site_name": "a", "nav": [{"Home": "index.md"}, {"Page": "guide/p.md"}]}
+            )
+            # Backdate the sources so the tree index records them
+            for dirpath, dirnames, filenames in os.walk("a"):
+                for name in dirnames + filenames:
+                    os.utime(os.path.join(dirpath, name), ns=(10**18, 10**18))
+            copy = scheduler.IOScheduler._copy
+            failures = []
+
+            def fail_once(io_scheduler, src, dst, size):
+                if src.endswith("p.md") and not failures:
+                    failures.append(src)
+                    raise OSError(5, "Input/output error")
+                return copy(io_scheduler, src, dst, size)
+
+            messages = []
+            with mock.patch.object(scheduler.IOScheduler, "_copy", autospec=True, side_effect=fail_once):
+                with scheduler.IOScheduler(max_files=2) as io_scheduler:
+                    mkdocsmerge.merge.run_merge(
+                        "master", ["a"], False, messages.append, scheduler=io_scheduler, tree_index=True
+                    )
+                    self.assertIn('Error copying files of site "a". This site will be skipped.', messages)
+                    mkdocsmerge.merge.run_merge(
+                        "master", ["a"], False, lambda x: None, scheduler=io_scheduler, tree_index=True
+                    )
+        finally:
+            os.chdir(owd)
+
+        self.assertEqual(len(failures), 1)
+        self.assertTrue(os.path.isfile(os.path.join(self.tmpdir, "master", "docs", "a", "guide", "p.md")))
+
+
+if __name__ == "__main__":
+    unittest.main()
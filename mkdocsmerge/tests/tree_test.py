@@ -0,0 +1,94 @@
+"""
+Tests for the copy of the sites' docs directories and the directory index.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from mkdocsmerge import tree
+
+
+def write_file(path, content, age=60):
+    """
+    Writes a file and backdates it (and its directory), so its timestamps are
+    not considered racy.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+    past = time.time() - age
+    os.utime(path, (past, past))
+    os.utime(os.path.dirname(path), (past, past))
+
+
+class TestCopyTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.src = os.path.join(self.tmpdir, "src")
+        self.dst = os.path.join(self.tmpdir, "dst")
+        write_file(os.path.join(self.src, "guide", "install.md"), "# Install")
+        write_file(os.path.join(self.src, "index.md"), "# Home")
+        past = time.time() - 60
+        os.utime(self.src, (past, past))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_skips_unchanged_files(self):
+        first = tree.copy_tree(self.src, self.dst)
+        self.assertEqual(sorted(first.added), ["guide/install.md", "index.md"])
+        self.assertEqual(first.bytes, len("# Install") + len("# Home"))
+
+        write_file(os.path.join(self.src, "index.md"), "# New home", age=30)
+        second = tree.copy_tree(self.src, self.dst)
+        self.assertEqual(second.added, [])
+        self.assertEqual(second.modified, ["index.md"])
+        self.assertEqual(second.unchanged, ["guide/install.md"])
+        with open(os.path.join(self.dst, "index.md")) as f:
+            self.assertEqual(f.read(), "# New home")
+
+    def test_recent_files_are_always_copied(self):
+        tree.copy_tree(self.src, self.dst)
+        # Same size and a timestamp within the racy window
+        with open(os.path.join(self.src, "index.md"), "w") as f:
+            f.write("# Hoom")
+        result = tree.copy_tree(self.src, self.dst)
+        self.assertEqual(result.modified, ["index.md"])
+
+    def test_index_skips_unmodified_directories(self):
+        index_path = os.path.join(self.tmpdir, "state", "index.json")
+        index = tree.TreeIndex(index_path)
+        tree.copy_tree(self.src, self.dst, index=index)
+        index.save()
+
+        # A reloaded index avoids listing any directory
+        index = tree.TreeIndex(index_path)
+        with mock.patch("mkdocsmerge.tree.os.scandir", side_effect=AssertionError("directory listed")):
+            result = tree.copy_tree(self.src, self.dst, index=index)
+        self.assertEqual(sorted(result.unchanged), ["guide/install.md", "index.md"])
+
+        # Only the directory with a new entry is listed again
+        write_file(os.path.join(self.src, "guide", "usage.md"), "# Usage")
+        with mock.patch("mkdocsmerge.tree.os.scandir", wraps=os.scandir) as scandir:
+            result = tree.copy_tree(self.src, self.dst, index=index)
+        self.assertEqual([call.args[0] for call in scandir.call_args_list], [os.path.join(self.src, "guide")])
+        self.assertEqual(result.added, ["guide/usage.md"])
+        self.assertTrue(os.path.isfile(os.path.join(self.dst, "guide", "usage.md")))
+
+    def test_index_ignored_for_missing_destination(self):
+        index = tree.TreeIndex(os.path.join(self.tmpdir, "index.json"))
+        tree.copy_tree(self.src, self.dst, index=index)
+        shutil.rmtree(self.dst)
+
+        result = tree.copy_tree(self.src, self.dst, index=index)
+        self.assertEqual(sorted(result.added), ["guide/install.md", "index.md"])
+        self.assertTrue(os.path.isfile(os.path.join(self.dst, "guide", "install.md")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Tests for the post-merge nav integrity check.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+import mkdocsmerge.merge
+from mkdocsmerge import verify
+from mkdocsmerge.__main__ import cli
+
+from .utils import generate_website
+
+
+class TestVerify(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.owd = os.getcwd()
+        os.chdir(self.tmpdir)
+
+    def tearDown(self):
+        os.chdir(self.owd)
+        shutil.rmtree(self.tmpdir)
+
+    def test_nav_paths(self):
+        nav = [
+            {"Home": "index.md"},
+            {"Guide": ["guide/index.md", {"Setup": "guide/./setup.md"}]},
+            {"Source": "https://github.com/ovasquez/mkdocs-merge"},
+        ]
+        self.assertEqual(list(verify.nav_paths(nav)), ["index.md", "guide/index.md", "guide/setup.md"])
+
+    def test_verify_reports_missing_and_orphan_pages(self):
+        generate_website(self.tmpdir, "master", {"site_name": "Master", "nav": [{"Home": "index.md"}]})
+        generate_website(
+            self.tmpdir,
+            "project_a",
+            {"site_name": "Project A", "nav": [{"Home": "index.md"}, {"About": "about.md"}]},
+        )
+        generate_website(self.tmpdir, "project_b", {"site_name": "Project B", "nav": [{"Home": "index.md"}]})
+        os.remove(os.path.join("project_a", "docs", "about.md"))
+        with open(os.path.join("project_b", "docs", "extra.md"), "w") as f:
+            f.write("# Not in nav")
+        with open(os.path.join("project_b", "docs", "logo.png"), "w") as f:
+            f.write("not a page")
+
+        messages = []
+        with self.assertRaises(verify.VerificationFailed):
+            mkdocsmerge.merge.run_merge("master", ["project_a", "project_b"], False, messages.append, verify=True)
+
+        self.assertIn('Site "Project A": nav entry points to a missing page: project_a/about.md', messages)
+        self.assertIn('Warning: site "Project B": page is not included in the nav: project_b/extra.md', messages)
+        self.assertFalse(any("logo.png" in message for message in messages))
+        self.assertNotIn("Verification passed: all nav entries point to merged pages.", messages)
+
+        # The merge is still written
+        with open(os.path.join("master", "mkdocs.yml")) as f:
+            self.assertIn("Project B", f.read())
+
+    def test_verify_failure_exit_status(self):
+        generate_website(self.tmpdir, "master", {"site_name": "Master", "nav": [{"Home": "index.md"}]})
+        generate_website(self.tmpdir, "project_a", {"site_name": "Project A", "nav": [{"About": "about.md"}]})
+        os.remove(os.path.join("project_a", "docs", "about.md"))
+
+        result = CliRunner().invoke(cli, ["run", "master", "project_a", "--verify"])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn("nav entry points to a missing page: project_a/about.md", result.output)
+
+    def test_pages_not_in_nav_are_warnings(self):
+        generate_website(self.tmpdir, "master", {"site_name": "Master", "nav": [{"Home": "index.md"}]})
+        generate_website(self.tmpdir, "project_a", {"site_name": "Project A", "nav": [{"Home": "index.md"}]})
+        with open(os.path.join("project_a", "docs", "snippet.md"), "w") as f:
+            f.write("Linked from other pages")
+
+        result = CliRunner().invoke(cli, ["run", "master", "project_a", "--verify"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("page is not included in the nav: project_a/snippet.md", result.output)
+        self.assertIn("Verification passed: all nav entries point to merged pages.", result.output)
+
+    def test_verify_passes(self):
+        generate_website(self.tmpdir, "master", {"site_name": "Master", "nav": [{"Home": "index.md"}]})
+        generate_website(self.tmpdir, "project_a", {"site_name": "Project A", "nav": [{"Home": "index.md"}]})
+
+        messages = []
+        mkdocsmerge.merge.run_merge("master", ["project_a"], False, messages.append, verify=True)
+        self.assertIn("Verification passed: all nav entries point to merged pages.", messages)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,258 @@
+"""
+Copy of the sites' docs directories into the master site.
+
+Files whose size and modification time match the already merged copy are not
+copied again. A source directory can be copied to several destinations in a
+single walk. Optionally, a persisted TreeIndex remembers the modification
+time and entries of every source directory, so that directories that did not
+change since the previous merge are not listed again and their files are not
+stat-ed at all.
+"""
+
+import json
+import os
+import shutil
+import stat
+import time
+
+# Timestamps this close to the start of the copy are not trusted, a file could
+# be modified again within the same filesystem clock tick (same as git's
+# "racily clean" entries).
+RACY_NS = 2 * 10**9
+
+
+class CopyResult:
+    """
+    Outcome of copying a directory tree. Paths are relative to the copied
+    directory and use "/" as separator.
+    """
+
+    def __init__(self):
+        self.added = []
+        self.modified = []
+        self.unchanged = []
+        self.bytes = 0
+
+    @property
+    def copied(self):
+        return self.added + self.modified
+
+    @property
+    def files(self):
+        return self.added + self.modified + self.unchanged
+
+    def to_dict(self):
+        return {"added": self.added, "modified": self.modified, "unchanged": self.unchanged, "bytes": self.bytes}
+
+    @classmethod
+    def from_dict(cls, data):
+        result = cls()
+        result.added = list(data["added"])
+        result.modified = list(data["modified"])
+        result.unchanged = list(data["unchanged"])
+        result.bytes = data["bytes"]
+        return result
+
+
+class TreeIndex:
+    """
+    Persisted index of source directories: their modification time, the
+    destinations they were copied to and their entries.
+
+    The modification time of a directory only changes when entries are added,
+    removed or renamed in it, so files edited in place inside an unchanged
+    directory are not detected. This fits sources updated by tools that write
+    files through a rename or recreate them (git checkouts, rsync, artifact
+    extraction).
+    """
+
+    VERSION = 2
+
+    def __init__(self, path):
+        self.path = path
+        self.dirs = {}
+        try:
+            with open(path) as index_file:
+                data = json.load(index_file)
+            if data.get("version") == self.VERSION:
+                self.dirs = data["dirs"]
+        except (OSError, ValueError, KeyError):
+            # A missing or corrupt index only means a full walk
+            self.dirs = {}
+
+    def lookup(self, directory, mtime_ns, destinations):
+        """
+        Returns the recorded entries of the directory if it was not modified
+        since it was copied to the same destinations, None otherwise.
+        """
+        entry = self.dirs.get(os.path.abspath(directory))
+        if entry is None or entry["mtime_ns"] != mtime_ns or entry["dst"] != _abspaths(destinations):
+            return None
+        return entry
+
+    def record(self, directory, mtime_ns, destinations, files, dirs):
+        self.dirs[os.path.abspath(directory)] = {
+            "mtime_ns": mtime_ns,
+            "dst": _abspaths(destinations),
+            "files": files,
+            "dirs": dirs,
+        }
+
+    def forget(self, directory):
+        self.dirs.pop(os.path.abspath(directory), None)
+
+    def forget_tree(self, directory):
+        """
+        Forgets the directory and all the directories under it, e.g. when
+        some of their files could not be copied.
+        """
+        directory = os.path.abspath(directory)
+        prefix = os.path.join(directory, "")
+        for path in [path for path in self.dirs if path == directory or path.startswith(prefix)]:
+            del self.dirs[path]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as index_file:
+            json.dump({"version": self.VERSION, "dirs": self.dirs}, index_file)
+        os.replace(tmp_path, self.path)
+
+
+def copy_file(src, dst, size):
+    """
+    Default file copy, preserving the metadata so unchanged files can be
+    detected on the next merge.
+    """
+    unlink_shared(dst)
+    shutil.copy2(src, dst)
+
+
+def unlink_shared(path):
+    """
+    Removes path if it is a symbolic link or a hard link shared with another
+    file, so that writing it does not write through the link (e.g. into the
+    master site files linked in output mode).
+    """
+    try:
+        path_stat = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if stat.S_ISLNK(path_stat.st_mode) or path_stat.st_nlink > 1:
+        os.unlink(path)
+
+
+def write_text(path, text):
+    """
+    Writes a text file, unless it already has that text.
+
+    Returns:
+        True if the file was written
+    """
+    try:
+        with open(path) as text_file:
+            if text_file.read() == text:
+                return False
+    except FileNotFoundError:
+        pass
+    unlink_shared(path)
+    with open(path, "w") as text_file:
+        text_file.write(text)
+    return True
+
+
+def copy_tree(src, dst, index=None, copy_function=copy_file):
+    """
+    Copies the src directory into dst, which may already exist, skipping the
+    files that are unchanged since the previous copy.
+
+    Args:
+        src: Directory to copy
+        dst: Destination directory
+        index: Optional TreeIndex used to skip unmodified source directories
+        copy_function: Function called as copy_function(src, dst, size) for
+                       every file that has to be copied
+
+    Returns:
+        CopyResult with the added, modified and unchanged files
+    """
+    return copy_tree_multi(src, [dst], index=index, copy_function=copy_function)[0]
+
+
+def copy_tree_multi(src, dsts, index=None, copy_function=copy_file):
+    """
+    Same as copy_tree, but copies the src directory into every one of the
+    dsts directories while walking it only once.
+
+    Returns:
+        List with the CopyResult of each destination
+    """
+    results = [CopyResult() for _ in dsts]
+    racy_limit = time.time_ns() - RACY_NS
+    _copy_dir(src, list(dsts), "", index, copy_function, results, racy_limit)
+    return results
+
+
+def _copy_dir(src, dsts, rel, index, copy_function, results, racy_limit):
+    mtime_ns = os.stat(src).st_mtime_ns
+    cached = index.lookup(src, mtime_ns, dsts) if index is not None else None
+
+    if cached is not None and all(os.path.isdir(dst) for dst in dsts):
+        # Nothing was added, removed or renamed in this directory
+        for result in results:
+            result.unchanged.extend(rel + name for name in cached["files"])
+        subdirs = cached["dirs"]
+    else:
+        for dst in dsts:
+            os.makedirs(dst, exist_ok=True)
+        files = {}
+        subdirs = []
+        with os.scandir(src) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    subdirs.append(entry.name)
+                    continue
+                src_stat = entry.stat()
+                files[entry.name] = src_stat.st_size
+                for dst, result in zip(dsts, results):
+                    target = os.path.join(dst, entry.name)
+                    state = _compare(src_stat, target, racy_limit)
+                    if state != "unchanged":
+                        copy_function(entry.path, target, src_stat.st_size)
+                        result.bytes += src_stat.st_size
+                    getattr(result, state).append(rel + entry.name)
+
+        if index is not None:
+            if mtime_ns < racy_limit:
+                index.record(src, mtime_ns, dsts, files, sorted(subdirs))
+            else:
+                index.forget(src)
+
+    for name in sorted(subdirs):
+        _copy_dir(
+            os.path.join(src, name),
+            [os.path.join(dst, name) for dst in dsts],
+            rel + name + "/",
+            index,
+            copy_function,
+            results,
+            racy_limit,
+        )
+
+
+def _abspaths(paths):
+    return [os.path.abspath(path) for path in paths]
+
+
+def _compare(src_stat, target, racy_limit):
+    try:
+        dst_stat = os.stat(target)
+    except FileNotFoundError:
+        return "added"
+    if (
+        dst_stat.st_size == src_stat.st_size
+        and dst_stat.st_mtime_ns == src_stat.st_mtime_ns
+        and src_stat.st_mtime_ns < racy_limit
+    ):
+        return "unchanged"
+    return "modified"
@@ -0,0 +1,108 @@
+"""
+Integrity check of the merged navigation against the files copied by the merge.
+"""
+
+import os
+import posixpath
+
+# File extensions MkDocs treats as pages
+PAGE_EXTENSIONS = (".md", ".markdown", ".mdown", ".mkdn", ".mkd")
+
+
+class VerificationFailed(Exception):
+    """
+    The merged nav has entries pointing to missing pages.
+    """
+
+
+class SiteReport:
+    """
+    Problems found for a single merged site: nav entries pointing to files
+    that were not copied and copied pages that are not in any nav entry.
+    Only the former are errors: as with MkDocs, pages may be left out of the
+    nav (e.g. pages only linked from other pages).
+    """
+
+    def __init__(self, site, site_name, missing, orphans):
+        self.site = site
+        self.site_name = site_name
+        self.missing = missing
+        self.orphans = orphans
+
+    @property
+    def ok(self):
+        return not self.missing
+
+
+def nav_paths(nav):
+    """
+    Yields every page path of a nav structure, ignoring external links.
+    """
+    if isinstance(nav, str):
+        if "://" not in nav:
+            yield posixpath.normpath(nav)
+    elif isinstance(nav, list):
+        for page in nav:
+            yield from nav_paths(page)
+    elif isinstance(nav, dict):
+        for page in nav.values():
+            yield from nav_paths(page)
+
+
+def verify_sites(merged_sites):
+    """
+    Checks the rewritten nav of each merged site against an index of the files
+    copied by the merge, built from the copy results instead of walking the
+    master docs directory again.
+
+    Args:
+        merged_sites: List of merge.MergedSite records
+
+    Returns:
+        List with a SiteReport per merged site
+    """
+    copied = set()
+    referenced = set()
+    for merged in merged_sites:
+        copied.update(merged.site_root + "/" + path for path in merged.copied.files)
+        referenced.update(nav_paths(merged.nav))
+
+    reports = []
+    for merged in merged_sites:
+        missing = sorted({path for path in nav_paths(merged.nav) if path not in copied})
+        orphans = sorted(
+            merged.site_root + "/" + path
+            for path in merged.copied.files
+            if path.lower().endswith(PAGE_EXTENSIONS) and merged.site_root + "/" + path not in referenced
+        )
+        reports.append(SiteReport(merged.site, merged.site_name, missing, orphans))
+    return reports
+
+
+def select_reports(reports, sites):
+    """
+    Returns the reports about the given sites.
+    """
+    keys = {_site_key(site) for site in sites}
+    return [report for report in reports if _site_key(report.site) in keys]
+
+
+def print_reports(reports, print_func):
+    """
+    Prints the problems found by verify_sites and returns True if no nav entry
+    points to a missing page. Pages not in the nav are only warnings.
+    """
+    for report in reports:
+        for path in report.missing:
+            print_func(f'Site "{report.site_name}": nav entry points to a missing page: {path}')
+        for path in report.orphans:
+            print_func(f'Warning: site "{report.site_name}": page is not included in the nav: {path}')
+
+    ok = all(report.ok for report in reports)
+    if ok:
+        print_func("Verification passed: all nav entries point to merged pages.")
+    return ok
+
+
+def _site_key(site):
+    return site if "://" in site else os.path.abspath(site)